@@ -1,12 +1,18 @@
 import glob
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pygimli as pg
-import pygimli.meshtools as mt
 from pygimli.physics import ert
 
+# Make the shared lib package importable when this module is run or tested from its own folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.ert_container import load_survey_data
+from lib.mesh_cache import cached_mesh
+
 
 def ensure_output_folder():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -48,14 +54,44 @@ def create_mesh(start=[0, 0],
                 end=[47, -8],
                 quality=33.5,
                 area=0.5):
-    # Create Geometry and Mesh
-    geom = mt.createWorld(start=start, end=end, worldMarker=False)
-    mesh = mt.createMesh(geom, quality=quality, area=area, smooth=True)
-    mesh.save("mesh.bms")
-    return mesh
+    # Geometry and mesh, from the shared mesh cache when this line was meshed before
+    return cached_mesh(start, end, quality, area)
+
+
+def figure_paths(date):
+    """Paths of the inversion figure and the data plot startInversion saves for a survey."""
+    output_dir = ensure_output_folder()
+    stem = os.path.splitext(os.path.basename(date))[0]
+    return (os.path.join(output_dir, f"inversion_result_{stem}.png"),
+            os.path.join(output_dir, f"ert_plot_{stem}.png"))
+
+
+def report_chi2(iteration, inversion):
+    """Inversion post-step hook, logs the data fit after every iteration."""
+    pg.info(f"Iteration {iteration}: chi2 = {inversion.chi2():.2f}")
+
+
+def startInversion(start, end, quality, area, inversion_params, file_path, zWeight=0.7, name=None):
+    """
+    Run the ERT inversion and save the data and result plots, see invert_survey.
+
+    Returns the paths of the inversion figure and the data plot.
+    """
+    result = invert_survey(start, end, quality, area, inversion_params, file_path, zWeight, name)
+    return result["figure"], result["ert_plot"]
 
 
-def startInversion(start, end, quality, area, inversion_params, file_path, zWeight=0.7):
+def invert_survey(start, end, quality, area, inversion_params, file_path, zWeight=0.7, name=None):
+    """
+    Run the ERT inversion and save the data and result plots.
+
+    file_path is either a processed survey file or a pg.DataContainerERT (e.g. from
+    data_processor.build_survey_container). `name` labels the outputs of an in-memory container
+    and defaults to "survey".
+
+    Returns {"figure", "ert_plot", "model", "mesh", "para_domain"}: the paths of the inversion figure and
+    the data plot, and the inverted resistivity model with its mesh, which water_computing can reuse.
+    """
     # Unpack inversion parameters
     lam = inversion_params["lambda"]
     maxIter = inversion_params["max_iterations"]
@@ -63,67 +99,45 @@ def startInversion(start, end, quality, area, inversion_params, file_path, zWeig
     robust_data = inversion_params["robust_data"]
 
     # Log inversion starting details
-    print(f"Starting inversion with file: {file_path}")
+    print(f"Starting inversion with file: {name or file_path}")
     print(f"Using parameters: lambda={lam}, maxIter={maxIter}, dPhi={dPhi}, robust={robust_data}, zWeight={zWeight}")
 
-    output_dir = ensure_output_folder()
-
-    # Load the data file, the first file under /Raw
-    try:
-        file_to_convert = file_path
-    except FileNotFoundError as e:
-        pg.error(str(e))
-        return
-
     mesh = create_mesh(start, end, quality, area)
 
     # Inversion preparing
-    date = os.path.basename(file_to_convert)  # Extract the file name from the path
-    mgr = ert.ERTManager(file_to_convert, verbose=True, debug=True)
-    rhoa = np.array(mgr.data["rhoa"])
-    Argw = np.argwhere(rhoa <= 0)
-    pg.info("Filtered rhoa (min/max)", min(mgr.data["rhoa"]), max(mgr.data["rhoa"]))
-    Accur = (1 - np.shape(Argw)[0] / np.shape(rhoa)[0]) * 100
-
-    # Data processing Filter negative value
-    mgr.data.remove(mgr.data["rhoa"] < 0)
-
-    # Add estimated Error and geometrical factor
-    mgr.data["err"] = ert.estimateError(
-        mgr.data, absoluteError=0.001, relativeError=0.03
-    )
+    if isinstance(file_path, pg.DataContainerERT):
+        date = name or "survey"
+    else:
+        date = os.path.basename(file_path)  # Extract the file name from the path
+    fig_filename, ert_plot_filename = figure_paths(date)
+
+    # Negative values filtered, estimated error and geometrical factors added
+    mgr = ert.ERTManager(load_survey_data(file_path), verbose=True, debug=True)
     pg.info("Filtered rhoa (min/max)", min(mgr.data["rhoa"]), max(mgr.data["rhoa"]))
-    mgr.data["k"] = ert.createGeometricFactors(mgr.data, numerical=True)
 
     # Show the ERT data plot and save it
     ert_fig, ert_ax = plt.subplots()
     ert_plot = ert.show(mgr.data, ax=ert_ax)
-    ert_plot_filename = os.path.join(output_dir, f"ert_plot_{os.path.splitext(date)[0]}.png")
     ert_fig.savefig(ert_plot_filename, dpi=300, bbox_inches="tight")
     plt.close(ert_fig)
 
     print(f"ERT plot saved as: {ert_plot_filename}")
 
-    # Inversion here
-    tolerance = 1  # Abort criterion for chi2 (chi-squared) for an inversion process.
-    # Chi-squared represents the goodness of fit between the model and the observed data.
-    for iteration in range(maxIter):
-        inv = mgr.invert(
-            mesh=mesh, zWeight=zWeight, lam=lam, maxIter=1, dPhi=dPhi, CHI1OPT=5, Verbose=True
-        )
-
-        if hasattr(inv, "chi2"):
-            chi2 = inv.chi2()  # Get the chi2 value for the current iteration
-
-            # Check if chi2 is below the tolerance level
-            if chi2 < tolerance:
-                pg.info(f"Inversion converged at iteration {iteration}. Chi2: {chi2}")
-                break
+    # Inversion here: one run of up to maxIter iterations that keeps the model and Jacobian between
+    # iterations and stops early once chi2 (chi-squared) reaches 1, i.e. the model fits the data
+    # within their errors, or chi2 improves by less than dPhi percent.
+    mgr.inv.setPostStep(report_chi2)
+    inv = mgr.invert(
+        mesh=mesh, zWeight=zWeight, lam=lam, maxIter=maxIter, dPhi=dPhi, stopAtChi1=True, CHI1OPT=5, Verbose=True
+    )
+    chi2_history = mgr.inv.chi2History
+    if chi2_history[-1] <= 1:
+        pg.info(f"Inversion converged at iteration {len(chi2_history) - 1}. Chi2: {chi2_history[-1]}")
 
     # Storing and saving data for later manipulation
     Storage = np.zeros([np.shape(mesh.cellMarkers())[0], 1])
     Storage[:, 0] = inv
-    mgr.saveResult(date[:-4])
+    mgr.saveResult(os.path.splitext(date)[0])
 
     # Plotting
     fig1, (ax1) = plt.subplots(1, sharex=True, figsize=(16.0, 5))
@@ -135,9 +149,6 @@ def startInversion(start, end, quality, area, inversion_params, file_path, zWeig
     plt.tight_layout()
 
     # Save the figure as PNG in the output folder
-    fig_filename = os.path.join(
-        output_dir, f"inversion_result_{os.path.splitext(date)[0]}.png"
-    )
     plt.savefig(fig_filename, dpi=300, bbox_inches="tight")
     print(f"Figure saved as: {fig_filename}")
 
@@ -146,7 +157,73 @@ def startInversion(start, end, quality, area, inversion_params, file_path, zWeig
 
     cleanup_temp_files()
 
-    return fig_filename, ert_plot_filename  # Return the path of the saved figure
+    return {"figure": fig_filename, "ert_plot": ert_plot_filename, "model": np.array(inv), "mesh": mesh,
+            "para_domain": mgr.paraDomain}
+
+
+def time_lapse_inversion(start, end, quality, area, inversion_params, file_paths, zWeight=0.7, names=None):
+    """
+    Invert an ordered series of surveys of one line, e.g. the daily surveys of a monitoring period.
+
+    All dates share one mesh and one ERT manager, so the forward operator is set up once, and every date
+    after the first starts from the model of the previous date instead of a homogeneous model. Small
+    changes between dates then converge in a few iterations.
+
+    Args:
+    - start, end, quality, area: Mesh parameters, see create_mesh
+    - inversion_params: {"lambda", "max_iterations", "dphi", "robust_data"}, as for invert_survey
+    - file_paths: Processed survey files or pg.DataContainerERT, in date order
+    - zWeight: Vertical weight of the smoothness constraint
+    - names: Labels of the dates, by default the file names
+
+    Returns {"models", "dates", "chi2", "chi2_history", "iterations", "mesh", "para_domain"}: models is the
+    stacked (cells x dates) resistivity array, chi2 and iterations the final fit and iteration count of every
+    date and chi2_history the fit after every iteration of every date. All but the meshes are also saved to
+    "time_lapse_<first>_<last>.npz" in the output folder, chi2_history as a (dates x iterations) array padded
+    with NaN.
+    """
+    lam = inversion_params["lambda"]
+    maxIter = inversion_params["max_iterations"]
+    dPhi = inversion_params["dphi"]
+
+    if names is None:
+        names = [os.path.splitext(os.path.basename(file_path))[0] if not isinstance(file_path, pg.DataContainerERT)
+                 else f"survey_{i}" for i, file_path in enumerate(file_paths)]
+    print(f"Starting time-lapse inversion of {len(file_paths)} surveys")
+
+    mesh = create_mesh(start, end, quality, area)
+    mgr = ert.ERTManager(verbose=True)
+    mgr.inv.setPostStep(report_chi2)
+
+    models = np.zeros([mesh.cellCount(), len(file_paths)])
+    chi2, chi2_history, iterations = [], [], []
+    start_model = None
+    for i, (file_path, name) in enumerate(zip(file_paths, names)):
+        pg.info(f"Time-lapse date {i + 1}/{len(file_paths)}: {name}")
+        data = load_survey_data(file_path)
+        # Sensors from (x, 0, z) to (x, z) as on the 2D mesh; invert only does this when it is given a mesh
+        data.ensure2D()
+        # The mesh is only handed over once; later dates reuse the forward operator's prepared mesh
+        models[:, i] = mgr.invert(
+            data, mesh=mesh if i == 0 else None, startModel=start_model,
+            zWeight=zWeight, lam=lam, maxIter=maxIter, dPhi=dPhi, stopAtChi1=True,
+        )
+        start_model = np.array(mgr.inv.model)
+        chi2_history.append(list(mgr.inv.chi2History))
+        chi2.append(chi2_history[-1][-1])
+        iterations.append(len(chi2_history[-1]) - 1)
+
+    history = np.full([len(chi2_history), max(len(h) for h in chi2_history)], np.nan)
+    for i, h in enumerate(chi2_history):
+        history[i, :len(h)] = h
+    output_file = os.path.join(ensure_output_folder(), f"time_lapse_{names[0]}_{names[-1]}.npz")
+    np.savez(output_file, models=models, dates=np.array(names), chi2=np.array(chi2), chi2_history=history,
+             iterations=np.array(iterations))
+    print(f"Time-lapse models saved to {output_file}")
+    cleanup_temp_files()
+
+    return {"models": models, "dates": list(names), "chi2": chi2, "chi2_history": chi2_history,
+            "iterations": iterations, "mesh": mesh, "para_domain": mgr.paraDomain}
 
 
 # if __name__ == "__main__":
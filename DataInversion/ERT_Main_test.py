@@ -1,6 +1,13 @@
 import os
+import numpy as np
+import pygimli as pg
 import pytest
-from ERT_Main import  startInversion, cleanup_temp_files, create_mesh
+from pygimli.physics import ert
+import ERT_Main
+from ERT_Main import  startInversion, cleanup_temp_files, create_mesh, time_lapse_inversion
+from benchmarks import synthetic
+from data_processor import process_surveys
+from lib import geometric_factors, mesh_cache
 
 
 
@@ -17,11 +24,109 @@ def test_start_inversion():
     except Exception as e:
         pytest.fail(f"startInversion failed with exception: {e}")
         
-def test_create_mesh():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
- 
+def test_create_mesh(tmp_path, monkeypatch):
+    # The mesh comes from the mesh cache, no mesh.bms is left in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+
     try:
-        create_mesh()
-        assert "mesh.bms" in os.listdir(current_dir)
+        mesh = create_mesh()
+        assert mesh.cellCount() > 0
+        assert "mesh.bms" not in os.listdir(tmp_path)
     except Exception as e:
         pytest.fail(f"create_mesh failed with exception: {e}")
+
+
+def test_time_lapse_inversion(tmp_path, monkeypatch):
+    synthetic.generate_survey_folder(tmp_path / "tx0", 3, quadrupole_count=60)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    process_surveys(str(tmp_path / "tx0"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "detailed"),
+                    str(tmp_path / "simplified"))
+    file_paths = sorted(str(path) for path in (tmp_path / "simplified").glob("*.txt"))
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ERT_Main, "ensure_output_folder", lambda: str(tmp_path))
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+    monkeypatch.setattr(geometric_factors, "CACHE_DIR", str(tmp_path / "geometric_factors"))
+    start_models = []
+    invert = ert.ERTManager.invert
+
+    def recording_invert(self, *args, **kwargs):
+        start_models.append(kwargs.get("startModel"))
+        return invert(self, *args, **kwargs)
+
+    monkeypatch.setattr(ert.ERTManager, "invert", recording_invert)
+
+    params = {"lambda": 10, "max_iterations": 2, "dphi": 2, "robust_data": False}
+    result = time_lapse_inversion([0, 0], [47, -8], 33.5, 2.0, params, file_paths)
+
+    assert result["models"].shape == (result["mesh"].cellCount(), 3)
+    # Every date after the first starts from the model of the date before
+    assert start_models[0] is None
+    np.testing.assert_allclose(start_models[1], result["models"][:, 0])
+    np.testing.assert_allclose(start_models[2], result["models"][:, 1])
+
+    with np.load(tmp_path / "time_lapse_2021-01-02_09-00-00_2021-01-04_09-00-00.npz") as saved:
+        np.testing.assert_array_equal(saved["models"], result["models"])
+        assert saved["dates"].tolist() == result["dates"]
+        np.testing.assert_array_equal(saved["chi2"], result["chi2"])
+        np.testing.assert_array_equal(saved["iterations"], result["iterations"])
+        for history, iterations, chi2 in zip(saved["chi2_history"], saved["iterations"], saved["chi2"]):
+            assert history[iterations] == chi2 and np.isnan(history[iterations + 1:]).all()
+
+
+def test_time_lapse_inversion_with_topography(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ERT_Main, "ensure_output_folder", lambda: str(tmp_path))
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+    monkeypatch.setattr(geometric_factors, "CACHE_DIR", str(tmp_path / "geometric_factors"))
+    scheme = ert.createData(elecs=np.linspace(0, 46, 24), schemeName='dd')
+    data = ert.simulate(create_mesh(area=2.0), scheme=scheme, res=100.0, noiseLevel=0, noiseAbs=0, seed=0)
+    # Electrodes with topography, stored as (x, 0, z) the way ert.load reads a processed survey
+    elevations = -0.02 * np.arange(24)
+    for i, z in enumerate(elevations):
+        data.setSensorPosition(i, pg.Pos(2 * i, 0, z))
+
+    sensor_positions = []
+    invert = ert.ERTManager.invert
+
+    def recording_invert(self, *args, **kwargs):
+        model = invert(self, *args, **kwargs)
+        sensor_positions.append(np.array(self.fop.data.sensorPositions()))
+        return model
+
+    monkeypatch.setattr(ert.ERTManager, "invert", recording_invert)
+    params = {"lambda": 10, "max_iterations": 1, "dphi": 2, "robust_data": False}
+    time_lapse_inversion([0, 0], [47, -8], 33.5, 2.0, params, [data, data])
+
+    # Every date is inverted with the electrodes at (x, z) of the 2D mesh
+    for positions in sensor_positions:
+        np.testing.assert_allclose(positions[:, :2], np.column_stack([2 * np.arange(24), elevations]))
+        np.testing.assert_allclose(positions[:, 2], 0)
+
+
+def test_inversion_reports_chi2_and_stops_at_chi2_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ERT_Main, "ensure_output_folder", lambda: str(tmp_path))
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+    monkeypatch.setattr(geometric_factors, "CACHE_DIR", str(tmp_path / "geometric_factors"))
+    # Noise-free data of a homogeneous half-space, fitted within the 3 % error after a few iterations
+    scheme = ert.createData(elecs=np.linspace(0, 46, 24), schemeName='dd')
+    data = ert.simulate(create_mesh(area=2.0), scheme=scheme, res=100.0, noiseLevel=0, noiseAbs=0, seed=0)
+
+    reports = []
+    report_chi2 = ERT_Main.report_chi2
+
+    def recording_report(iteration, inversion):
+        reports.append((iteration, inversion.chi2()))
+        report_chi2(iteration, inversion)
+
+    monkeypatch.setattr(ERT_Main, "report_chi2", recording_report)
+    params = {"lambda": 10, "max_iterations": 10, "dphi": 0.0001, "robust_data": False}
+    startInversion([0, 0], [47, -8], 33.5, 0.5, params, data, name="synthetic")
+
+    # Once for the start model and once after every iteration, until chi2 first reaches 1
+    iterations, chi2 = zip(*reports)
+    assert list(iterations) == list(range(len(reports)))
+    assert chi2[-1] <= 1 and all(value > 1 for value in chi2[:-1])
+    assert len(reports) - 1 < params["max_iterations"]
@@ -1,11 +1,18 @@
 import os
+import sys
 import glob
 import matplotlib.pyplot as plt
 import numpy as np
 import pygimli as pg
-import pygimli.meshtools as mt
 from pygimli.physics import ert
 
+# Make the shared lib package importable when this module is run or tested from its own folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.ert_container import load_survey_data
+from lib.mesh_cache import cached_mesh
+from lib.petrophysics import correct_temperature, water_content, write_water_content
+
 
 # Ensure output folder exists
 def ensure_output_folder():
@@ -36,17 +43,28 @@ def create_mesh(start=[0, 0],
                 end=[47, -8],
                 quality=33.5,
                 area=0.5, ):
-    # Create Geometry and Mesh
-    geom = mt.createWorld(start=start, end=end, worldMarker=False)
-    mesh = mt.createMesh(geom, quality=quality, area=area, smooth=True)
-    mesh.save("mesh.bms")
-    return mesh
+    # Geometry and mesh, from the shared mesh cache when this line was meshed before
+    return cached_mesh(start, end, quality, area)
 
 
 # Compute water content
 def water_computing(start=[0, 0], end=[47, -8], quality=33.5, area=0.5,
-                   lam=10, maxIter=6, dPhi=2, A=246.47, B=-0.627, processed_file_path=None):
-    """ERT Inversion and Visualization process"""
+                   lam=10, maxIter=6, dPhi=2, A=246.47, B=-0.627, processed_file_path=None, name=None,
+                   inversion_result=None, calibrations=None):
+    """
+    ERT Inversion and Visualization process
+
+    processed_file_path is either a processed survey file or a pg.DataContainerERT, in which case
+    `name` (default "survey") labels the outputs.
+
+    inversion_result is the result of DataInversion.ERT_Main.invert_survey for the same survey. When
+    given, that model is used and the data are not inverted again; only the temperature correction and the
+    petrophysical transform are applied. "mesh" and "para_domain" may be left out for a
+    model of the mesh of start/end/quality/area, e.g. one from lib.petrophysics.load_model.
+
+    calibrations is a list of (A, B) pairs and defaults to [(A, B)]. The water content of all of them is
+    written to "Water_content_<survey>.txt" and the figure shows the first one.
+    """
 
     output_folder = ensure_output_folder()
 
@@ -55,9 +73,16 @@ def water_computing(start=[0, 0], end=[47, -8], quality=33.5, area=0.5,
 
     file_to_process = processed_file_path
 
-    entries_sel = [file_to_process]
+    if isinstance(file_to_process, pg.DataContainerERT):
+        entries_sel = [name or "survey"]
+    else:
+        entries_sel = [file_to_process]
 
-    mesh = create_mesh(start=start, end=end, quality=quality, area=area)
+    if inversion_result is not None and "mesh" in inversion_result:
+        mesh = inversion_result["mesh"]
+    else:
+        mesh = create_mesh(start=start, end=end, quality=quality, area=area)
+    calibrations = calibrations or [(A, B)]
 
     centers = mesh.cellCenters()
     x_coordinates = centers[:, 0]
@@ -65,34 +90,29 @@ def water_computing(start=[0, 0], end=[47, -8], quality=33.5, area=0.5,
     Storage = np.zeros([np.shape(mesh.cellMarkers())[0], len(entries_sel)])
 
     for i, date in enumerate(entries_sel):
-        mgr = ert.ERTManager(file_to_process, verbose=True, debug=True)
-        mgr.data.remove(mgr.data["rhoa"] < 0)  # Filter negative values
-        mgr.data["err"] = ert.estimateError(mgr.data, absoluteError=0.001, relativeError=0.03)
-        mgr.data["k"] = ert.createGeometricFactors(mgr.data, numerical=True)
+        if inversion_result is not None:
+            # Reuse the resistivity model of invert_survey instead of inverting the same data twice
+            Storage[:, i] = inversion_result["model"]
+            para_domain = inversion_result.get("para_domain", mesh)
+        else:
+            # Negative values filtered, estimated error and geometrical factors added
+            mgr = ert.ERTManager(load_survey_data(file_to_process), verbose=True, debug=True)
 
-        inv = mgr.invert(mesh=mesh, lam=lam, maxIter=maxIter, dPhi=dPhi, CHI1OPT=5, Verbose=True)
-        Storage[:, i] = inv
+            inv = mgr.invert(mesh=mesh, lam=lam, maxIter=maxIter, dPhi=dPhi, CHI1OPT=5, Verbose=True)
+            Storage[:, i] = inv
 
-        mgr.saveResult(os.path.join(output_folder, f"{date[:-4]}_result.dat"))
+            mgr.saveResult(os.path.join(output_folder, f"{os.path.splitext(date)[0]}_result.dat"))
+            para_domain = mgr.paraDomain
 
-        fSWC = lambda x: A * x ** B
         temperature_points = [(0, -5), (-10, -5)]
-        T = 25.5
-
-        temperature_points.sort(key=lambda x: x[0])
-        for j in range(len(y_coordinates) - 1):
-            y = y_coordinates[j]
-            for i in range(len(temperature_points) - 1):
-                y1, T1 = temperature_points[i]
-                y2, T2 = temperature_points[i + 1]
-                if y1 <= y <= y2:
-                    T = T1 + (T2 - T1) * ((y - y1) / (y2 - y1))
-                    break
-                else:
-                    T = T1 if y < y1 else T2
-            Storage[j, :] = (1 + 0.025 * (T - 25)) * Storage[j, :]
-
-        SWC = fSWC(Storage)
+        Storage[:, i] = correct_temperature(Storage[:, i], y_coordinates, temperature_points)
+
+        # Water content of every cell for every calibration at once, (cells x calibrations)
+        SWC = water_content(Storage[:, i], calibrations)
+        write_water_content(
+            os.path.join(output_folder, f"Water_content_{os.path.basename(os.path.splitext(date)[0])}.txt"),
+            np.array(centers), Storage[:, i], calibrations, SWC,
+        )
         fig1, (ax1) = plt.subplots(1, figsize=(15.5, 7))
 
         pg.viewer.show(
@@ -100,8 +120,8 @@ def water_computing(start=[0, 0], end=[47, -8], quality=33.5, area=0.5,
             ax=ax1, cMin=0, cMax=30, cMap="Spectral", showMesh=True,
         )
 
-        ax1.set_xlim(-0, mgr.paraDomain.xmax())
-        ax1.set_ylim(-8, mgr.paraDomain.ymax())
+        ax1.set_xlim(-0, para_domain.xmax())
+        ax1.set_ylim(-8, para_domain.ymax())
         ax1.set_title(date)
 
         fig_filename = os.path.join(
@@ -1,6 +1,10 @@
 import os
+import numpy as np
 import pytest
+from pygimli.physics import ert
+import Water_Content_Main
 from Water_Content_Main import water_computing, cleanup_temp_files, create_mesh
+from lib import mesh_cache
 
 
 
@@ -17,11 +21,31 @@ def test_start_inversion():
     except Exception as e:
         pytest.fail(f"watercomputing failed with exception: {e}")
         
-def test_create_mesh():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
- 
+def test_create_mesh(tmp_path, monkeypatch):
+    # The mesh comes from the mesh cache, no mesh.bms is left in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+
     try:
-        create_mesh()
-        assert "mesh.bms" in os.listdir(current_dir)
+        mesh = create_mesh()
+        assert mesh.cellCount() > 0
+        assert "mesh.bms" not in os.listdir(tmp_path)
     except Exception as e:
         pytest.fail(f"create_mesh failed with exception: {e}")
+
+
+def test_water_computing_reuses_inversion_result(tmp_path, monkeypatch):
+    # A model from invert_survey (or the model cache) is converted to water content without inverting again
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", str(tmp_path / "meshes"))
+    monkeypatch.setattr(Water_Content_Main, "ensure_output_folder", lambda: str(tmp_path))
+    invert_calls = []
+    monkeypatch.setattr(ert.ERTManager, "invert", lambda *args, **kwargs: invert_calls.append(args))
+
+    mesh = create_mesh()
+    fig_filename = water_computing(processed_file_path="2021-01-02_09-00-00.txt",
+                                   inversion_result={"model": np.full(mesh.cellCount(), 100.0)})
+
+    assert invert_calls == []
+    assert os.path.exists(fig_filename)
+    assert os.path.exists(tmp_path / "Water_content_2021-01-02_09-00-00.txt")
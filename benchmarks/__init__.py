@@ -0,0 +1,8 @@
+"""
+Benchmarks for the processing pipeline.
+
+synthetic.py generates tx0 surveys and GNtemp temperature logs of configurable size, run_benchmarks.py
+times every pipeline stage on them and writes a JSON report of wall time and peak RSS per stage:
+
+    python -m benchmarks.run_benchmarks --sizes small medium --output benchmark_report.json
+"""
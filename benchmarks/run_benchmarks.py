@@ -0,0 +1,253 @@
+"""
+Times each pipeline stage on synthetic data and writes a JSON report.
+
+Every stage runs in its own child process so its peak RSS is measured in isolation; the wall time covers
+only the stage call, not the interpreter start or imports. Stages that need pyGIMLi are reported as
+skipped when it is not installed. Stages work in a temporary folder: their outputs and caches never touch the
+repository or the user's cache folder, and the caches start empty for every size. A stage selected without
+the stages it reads from runs them first, untimed and unreported.
+
+    python -m benchmarks.run_benchmarks --sizes small medium --output benchmark_report.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+
+SIZES = {
+    'small': {'electrodes': 48, 'quadrupoles': 200, 'surveys': 4, 'years': 1},
+    'medium': {'electrodes': 48, 'quadrupoles': 2000, 'surveys': 16, 'years': 2},
+    'large': {'electrodes': 48, 'quadrupoles': 20000, 'surveys': 64, 'years': 5},
+}
+
+STAGES = [
+    'convert_tx0_to_txt',
+    'filter_temperature_data_by_date',
+    'calibrate_resistivity',
+    'create_mesh',
+    'startInversion',
+    'water_computing',
+    'time_lapse_inversion',
+]
+PYGIMLI_STAGES = {'create_mesh', 'startInversion', 'water_computing', 'time_lapse_inversion'}
+# Stages whose outputs a stage reads; they are run untimed first when only the later stage is selected
+PREREQUISITES = {
+    'filter_temperature_data_by_date': ['convert_tx0_to_txt'],
+    'calibrate_resistivity': ['filter_temperature_data_by_date'],
+    'startInversion': ['calibrate_resistivity'],
+    'water_computing': ['calibrate_resistivity'],
+    'time_lapse_inversion': ['calibrate_resistivity'],
+}
+
+INVERSION_PARAMS = {
+    "lambda": 10,
+    "max_iterations": 2,
+    "dphi": 2,
+    "robust_data": False,
+}
+MESH_QUALITY = 33.5
+MESH_AREA = 0.5
+
+# Cache folder overrides a parent environment may set, cleared so every cache lives under the work folder
+CACHE_VARIABLES = ('ERT_MESH_CACHE', 'ERT_GEOMETRIC_FACTOR_CACHE', 'ERT_MODEL_CACHE', 'ERT_TEMPERATURE_CACHE')
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB, or None where the resource module is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def prepare_inputs(work_dir, size):
+    """Generate the synthetic tx0 surveys and temperature log of one size, return the stage paths."""
+    paths = {
+        'work_dir': work_dir,
+        'tx0_dir': os.path.join(work_dir, 'tx0'),
+        'txt_dir': os.path.join(work_dir, 'txt'),
+        'raw_temperature': os.path.join(work_dir, 'GNtemp.txt'),
+        'filtered_temperature': os.path.join(work_dir, 'filtered_temperature.txt'),
+        'detailed_dir': os.path.join(work_dir, 'detailed'),
+        'simplified_dir': os.path.join(work_dir, 'simplified'),
+        'electrodes': size['electrodes'],
+    }
+    synthetic.generate_survey_folder(paths['tx0_dir'], size['surveys'], electrode_count=size['electrodes'],
+                                     quadrupole_count=size['quadrupoles'])
+    synthetic.generate_temperature_log(paths['raw_temperature'], years=size['years'])
+    return paths
+
+
+def _redirect_outputs(work_dir):
+    """Send the figures and result files of the inversion stages to work_dir instead of the repository."""
+    from DataInversion import ERT_Main
+    from WaterContent import Water_Content_Main
+
+    for module in (ERT_Main, Water_Content_Main):
+        output_dir = os.path.join(work_dir, module.__name__.split('.')[0], 'Output')
+        os.makedirs(output_dir, exist_ok=True)
+        module.ensure_output_folder = lambda output_dir=output_dir: output_dir
+
+
+def with_prerequisites(stages):
+    """The stages together with every stage they depend on, in pipeline order."""
+    required = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in required:
+            required.add(stage)
+            pending.extend(PREREQUISITES.get(stage, []))
+    return [stage for stage in STAGES if stage in required]
+
+
+def _calibrated_surveys(paths):
+    """Paths of the calibrated surveys in date order; pyGIMLi may leave result files next to them."""
+    surveys = sorted(name for name in os.listdir(paths['simplified_dir']) if name.endswith('.txt'))
+    if not surveys:
+        raise RuntimeError("No calibrated survey to invert, run calibrate_resistivity first.")
+    return [os.path.join(paths['simplified_dir'], name) for name in surveys]
+
+
+def _call_stage(stage, paths):
+    # Imports happen before the clock starts so only the stage itself is timed
+    if stage in PYGIMLI_STAGES:
+        from DataInversion.ERT_Main import create_mesh, startInversion, time_lapse_inversion
+        from WaterContent.Water_Content_Main import water_computing
+        _redirect_outputs(paths['work_dir'])
+    else:
+        import data_processor
+
+    start, end = [0, 0], [paths['electrodes'] - 1, -8]
+    if stage == 'convert_tx0_to_txt':
+        call = lambda: data_processor.convert_tx0_to_txt(paths['tx0_dir'], paths['txt_dir'], '1')
+    elif stage == 'filter_temperature_data_by_date':
+        call = lambda: data_processor.filter_temperature_data_by_date(
+            paths['txt_dir'], paths['raw_temperature'], paths['filtered_temperature'])
+    elif stage == 'calibrate_resistivity':
+        call = lambda: data_processor.calibrate_resistivity(
+            paths['txt_dir'], paths['detailed_dir'], paths['simplified_dir'], paths['filtered_temperature'])
+    elif stage == 'create_mesh':
+        call = lambda: create_mesh(start=start, end=end, quality=MESH_QUALITY, area=MESH_AREA)
+    elif stage == 'startInversion':
+        survey = _calibrated_surveys(paths)[0]
+        call = lambda: startInversion(start, end, MESH_QUALITY, MESH_AREA, INVERSION_PARAMS, survey)
+    elif stage == 'water_computing':
+        survey = _calibrated_surveys(paths)[0]
+        call = lambda: water_computing(start, end, MESH_QUALITY, MESH_AREA, INVERSION_PARAMS['lambda'],
+                                       INVERSION_PARAMS['max_iterations'], INVERSION_PARAMS['dphi'],
+                                       processed_file_path=survey)
+    elif stage == 'time_lapse_inversion':
+        series = _calibrated_surveys(paths)
+        call = lambda: time_lapse_inversion(start, end, MESH_QUALITY, MESH_AREA, INVERSION_PARAMS, series)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started, baseline
+
+
+def run_stage(stage, paths):
+    """Child process entry point: runs one stage and returns its measurements."""
+    os.chdir(paths['work_dir'])  # the inversion writes scratch files to the working directory
+    # Set before the pipeline modules are imported, they read their cache folders on import
+    for variable in CACHE_VARIABLES:
+        os.environ.pop(variable, None)
+    os.environ['ERT_CACHE_ROOT'] = os.path.join(paths['work_dir'], 'cache')
+    if stage == 'create_mesh':
+        # An empty mesh cache of its own, so the stage times building the mesh rather than a cache hit
+        os.environ['ERT_MESH_CACHE'] = tempfile.mkdtemp(prefix='mesh_cache_', dir=paths['work_dir'])
+    if stage in PYGIMLI_STAGES:
+        try:
+            import pygimli  # noqa: F401
+        except ImportError:
+            return {'status': 'skipped', 'error': 'pygimli is not installed'}
+    try:
+        wall_time, baseline = _call_stage(stage, paths)
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+    return {
+        'status': 'success',
+        'wall_time_s': round(wall_time, 4),
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmarks(size_names, stages=STAGES, work_root=None):
+    """
+    Run the selected stages for every size in order, return one record per (size, stage).
+
+    Stages the selected ones depend on (see PREREQUISITES) also run, but are not reported.
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size_name in size_names:
+        size = SIZES[size_name]
+        with tempfile.TemporaryDirectory(prefix=f'bench_{size_name}_', dir=work_root) as work_dir:
+            print(f"Generating {size_name} inputs: {size}")
+            paths = prepare_inputs(work_dir, size)
+            for stage in with_prerequisites(stages):
+                # A fresh process per stage so ru_maxrss is not inherited from earlier stages
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    record = executor.submit(run_stage, stage, paths).result()
+                if stage not in stages:
+                    if record['status'] == 'error':
+                        print(f"{size_name:>8} prerequisite {stage} failed: {record['error']}")
+                    continue
+                record = {'size': size_name, 'stage': stage, **size, **record}
+                print(f"{size_name:>8} {stage:<32} {record['status']:<8} "
+                      f"{record.get('wall_time_s', '-')} s, peak RSS {record.get('peak_rss_mb', '-')} MB")
+                results.append(record)
+    return results
+
+
+def write_report(results, output_path):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report written to {output_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ERT processing pipeline on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small'])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--work-dir', default=None, help="Where to generate inputs (default: system temp)")
+    args = parser.parse_args(argv)
+
+    # Keep the pipeline order whatever order the stages were given in
+    stages = [stage for stage in STAGES if stage in args.stages]
+    write_report(run_benchmarks(args.sizes, stages, args.work_dir), args.output)
+
+
+if __name__ == '__main__':
+    main()
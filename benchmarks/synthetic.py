@@ -0,0 +1,117 @@
+"""
+Synthetic input data for benchmarks and tests.
+
+The generated files follow the layouts the pipeline reads:
+- tx0 surveys with an electrode position block and a 22-column data block
+  (a/b/m/n in columns 1-4, rho in column 10, x and z in columns 18 and 20)
+- GNtemp logs, tab separated, 'time' in '%d/%m/%Y %I:%M:%S %p' followed by one column per depth
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+TEMPERATURE_DEPTHS = ['-4', '-3.5', '-3', '-1.5', '-1', '-0.5']
+TX0_TIME_FORMAT = '%Y-%m-%d_%H-%M-%S'
+GNTEMP_TIME_FORMAT = '%d/%m/%Y %I:%M:%S %p'
+
+
+def dipole_dipole_configurations(electrode_count, quadrupole_count, rng):
+    """Random dipole-dipole quadrupoles (1-based a, b, m, n) that fit on the line."""
+    spacing = rng.integers(1, 4, size=quadrupole_count)
+    level = rng.integers(1, 7, size=quadrupole_count)
+    span = spacing * (level + 2)
+    # Shrink configurations that do not fit on short lines
+    too_long = span > electrode_count - 1
+    spacing[too_long] = 1
+    level[too_long] = np.minimum(level[too_long], max(electrode_count - 3, 1))
+    span = spacing * (level + 2)
+
+    a = 1 + (rng.random(quadrupole_count) * (electrode_count - span)).astype(int)
+    b = a + spacing
+    m = b + level * spacing
+    n = m + spacing
+    return a, b, m, n, level * spacing
+
+
+def generate_tx0_file(file_path, electrode_count=48, quadrupole_count=1000, electrode_spacing=1.0,
+                      index_offset=0, seed=0):
+    """
+    Write a synthetic tx0 survey.
+
+    Args:
+    - file_path: Output path, e.g. ".../2021-01-02_09-00-00.tx0"
+    - electrode_count: Number of electrodes on the line
+    - quadrupole_count: Number of data rows
+    - electrode_spacing: Distance between electrodes in metres
+    - index_offset: Added to every electrode index, as some loggers number from a non-1 start
+    - seed: Random seed, the same seed writes the same file
+    """
+    rng = np.random.default_rng(seed)
+    a, b, m, n, separation = dipole_dipole_configurations(electrode_count, quadrupole_count, rng)
+    x = (a + n - 2) / 2 * electrode_spacing
+    z = -0.3 * separation * electrode_spacing
+    rho = 100 * np.exp(rng.normal(0, 0.4, size=quadrupole_count) + 0.1 * separation)
+    current = rng.uniform(0.05, 0.5, size=quadrupole_count)
+    voltage = rho * current / 50
+
+    lines = [
+        "* Synthetic tx0 survey",
+        f"* Number of electrodes: {electrode_count}",
+        "* Electrode positions:",
+    ]
+    for i in range(electrode_count):
+        lines.append(f"* Electrode [{i + 1 + index_offset:4d}] = {i * electrode_spacing:10.3f} {0:10.3f} {0:10.3f}")
+    lines.append("* Remote electrode positions:")
+    lines.append("* Remote [   1] =      0.000      0.000      0.000")
+    lines.append("******************* * Data *******************")
+    lines.append("* num A B M N I U dU U/I dU/I rho phi f n nAB Profile Spread PseudoZ X Y Z date")
+    for k in range(quadrupole_count):
+        lines.append(
+            f"{k + 1} {a[k] + index_offset} {b[k] + index_offset} {m[k] + index_offset} {n[k] + index_offset} "
+            f"{current[k]:.4f} {voltage[k]:.5f} 0.00010 {voltage[k] / current[k]:.5f} 0.00010 "
+            f"{rho[k]:.3f} 0.000 4.000 1 1 1 1 {z[k]:.3f} {x[k]:.3f} 0.000 {z[k]:.3f} 0"
+        )
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def generate_survey_folder(folder, survey_count, start=datetime(2021, 1, 2, 9, 0, 0), interval=timedelta(days=1),
+                           electrode_count=48, quadrupole_count=1000, seed=0):
+    """Write survey_count tx0 files named by their survey time, one every `interval` from `start`."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(survey_count):
+        survey_time = start + i * interval
+        path = os.path.join(folder, survey_time.strftime(TX0_TIME_FORMAT) + '.tx0')
+        generate_tx0_file(path, electrode_count, quadrupole_count, seed=seed + i)
+        paths.append(path)
+    return paths
+
+
+def generate_temperature_log(file_path, years=1, start=datetime(2021, 1, 1), interval_minutes=30, seed=0):
+    """
+    Write a GNtemp temperature log covering `years` years at `interval_minutes` resolution.
+
+    Temperatures follow a seasonal and a daily cycle that are damped and delayed with depth, plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(years * 365 * 24 * 60 / interval_minutes)
+    minutes = np.arange(count) * interval_minutes
+    days = minutes / (24 * 60)
+
+    columns = []
+    for depth in TEMPERATURE_DEPTHS:
+        d = abs(float(depth))
+        seasonal = 8 * np.exp(-d / 2) * np.sin(2 * np.pi * days / 365 - d / 2)
+        daily = 3 * np.exp(-d * 4) * np.sin(2 * np.pi * days - d * 4)
+        columns.append(18 + seasonal + daily + rng.normal(0, 0.05, size=count))
+    temperatures = np.column_stack(columns)
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(['time'] + TEMPERATURE_DEPTHS) + '\n')
+        for i in range(count):
+            timestamp = (start + timedelta(minutes=int(minutes[i]))).strftime(GNTEMP_TIME_FORMAT)
+            f.write(timestamp + '\t' + '\t'.join(f"{value:.2f}" for value in temperatures[i]) + '\n')
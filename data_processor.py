@@ -1,28 +1,102 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from lib.Tx0ToTxtPolymorph import NoXZTx0ToTxtConverter, Tx0ToTxtConverter
+from lib.compressed_io import has_extension
+from lib.conversion_manifest import SURVEY_MANIFEST_NAME, ConversionManifest, file_sha256
 from lib.data_filter import extract_dates_from_filenames, filter_temperature_data
-from lib.resistivity_temperature_correction import load_temperature_data, process_files
+from lib.resistivity_temperature_correction import (MAX_TEMPERATURE_GAP, calibrate_survey, data_from_columns,
+                                                    process_files, survey_date, survey_profile_table,
+                                                    temperatures_for_date)
+from lib.temperature_store import TemperatureStore
 import pandas as pd
 
 
-def convert_tx0_to_txt(input_folder, output_folder, converter_choice):
-    """Convert tx0 files to txt files using the selected converter."""
-    if converter_choice == "1":
-        converter = Tx0ToTxtConverter(input_folder, output_folder)
-    elif converter_choice == "2":
-        converter = NoXZTx0ToTxtConverter(input_folder, output_folder)
-    else:
+CONVERTERS = {
+    "1": Tx0ToTxtConverter,
+    "2": NoXZTx0ToTxtConverter,
+}
+
+
+def _convert_single_file(converter_class, input_folder, output_folder, filename, write_cache=False):
+    """Convert one tx0 file and report the outcome. Module level so process pool workers can pickle it."""
+    try:
+        converter_class(input_folder, output_folder, write_cache=write_cache).process_file(filename)
+        return {"file": filename, "status": "success", "error": None}
+    except Exception as e:
+        return {"file": filename, "status": "error", "error": str(e)}
+
+
+def convert_tx0_to_txt(input_folder, output_folder, converter_choice, workers=1, incremental=False,
+                       write_cache=False):
+    """
+    Convert tx0 files to txt files using the selected converter. Compressed inputs such as
+    "*.tx0.gz", "*.tx0.xz" and "*.tx0.bz2" are decompressed on the fly.
+
+    Args:
+    - input_folder: Directory containing the .tx0 files
+    - output_folder: Directory for the converted .txt files
+    - converter_choice: "1" keeps the x/z columns, "2" drops them
+    - workers: Number of worker processes, 1 converts serially and None uses every core
+    - incremental: Keep a manifest in output_folder, skip tx0 files that are unchanged since their last
+      conversion and delete outputs whose tx0 source is gone
+    - write_cache: Also write the binary sidecar of lib.survey_cache next to every txt file
+
+    Returns a list of {"file", "status", "error"} dicts, one per tx0 file, in filename order.
+    Status is "success", "error" or, in incremental mode, "skipped".
+    """
+    converter_class = CONVERTERS.get(converter_choice)
+    if converter_class is None:
         print("Invalid converter option. Please choose 1 or 2.")
         return
 
+    converter = converter_class(input_folder, output_folder)
     converter.ensure_output_folder_exists()
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.tx0'):
-            converter.process_file(filename)
-    print("Conversion from tx0 to txt completed.")
+    filenames = sorted(filename for filename in os.listdir(input_folder) if has_extension(filename, '.tx0'))
+
+    results = {}
+    pending = filenames
+    if incremental:
+        manifest = ConversionManifest.load(output_folder)
+        manifest.remove_stale(filenames)
+        pending = []
+        for filename in filenames:
+            if manifest.is_up_to_date(filename, os.path.join(input_folder, filename), converter_class.__name__):
+                results[filename] = {"file": filename, "status": "skipped", "error": None}
+            else:
+                pending.append(filename)
+        print(f"{len(results)} tx0 files unchanged since the last conversion, {len(pending)} to convert.")
+
+    if workers == 1 or len(pending) < 2:
+        converted = [_convert_single_file(converter_class, input_folder, output_folder, filename, write_cache)
+                     for filename in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            converted = list(executor.map(_convert_single_file,
+                                          [converter_class] * len(pending),
+                                          [input_folder] * len(pending),
+                                          [output_folder] * len(pending),
+                                          pending,
+                                          [write_cache] * len(pending)))
 
+    for result in converted:
+        results[result["file"]] = result
+        if incremental and result["status"] == "success":
+            filename = result["file"]
+            manifest.record(filename, os.path.join(input_folder, filename), converter.output_filename(filename),
+                            converter_class.__name__)
+    if incremental:
+        manifest.save()
 
-def filter_temperature_data_by_date(txt_data_dir, raw_temp_file, output_temp_file):
+    results = [results[filename] for filename in filenames]
+    failed = [result for result in results if result["status"] == "error"]
+    for result in failed:
+        print(f"Error converting {result['file']}: {result['error']}")
+    print(f"Conversion from tx0 to txt completed. {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+    return results
+
+
+def filter_temperature_data_by_date(txt_data_dir, raw_temp_file, output_temp_file, chunksize=None):
+    """Filter the raw temperature log to the survey dates; chunksize streams the log (see filter_temperature_data)."""
     try:
         print(f"Starting temperature data filtering with raw temperature file: {raw_temp_file}")
         dates = extract_dates_from_filenames(txt_data_dir)
@@ -33,7 +107,7 @@ def filter_temperature_data_by_date(txt_data_dir, raw_temp_file, output_temp_fil
             print("No valid dates extracted from txt filenames. Check the txt files or extraction logic.")
             return
 
-        filter_temperature_data(raw_temp_file, dates, output_temp_file)
+        filter_temperature_data(raw_temp_file, dates, output_temp_file, chunksize=chunksize)
         print(f"Temperature data filtered and saved to {output_temp_file}")
 
     except Exception as e:
@@ -41,8 +115,15 @@ def filter_temperature_data_by_date(txt_data_dir, raw_temp_file, output_temp_fil
 
 
 
-def calibrate_resistivity(input_folder, output_dir_detailed, output_dir_simplified, temperature_file):
-    """Calibrate resistivity using the temperature data."""
+def calibrate_resistivity(input_folder, output_dir_detailed, output_dir_simplified, temperature_file,
+                          write_cache=False, workers=1, max_gap=MAX_TEMPERATURE_GAP):
+    """
+    Calibrate resistivity using the temperature data, optionally writing binary sidecars of the outputs.
+
+    workers is the number of processes calibrating files concurrently, None uses every core. max_gap is the
+    longest logger gap survey temperatures are interpolated across, see survey_profile_table. Returns the
+    per-file records of process_files, or None if the temperature data could not be loaded.
+    """
     try:
         print(f"Starting resistivity calibration with temperature file: {temperature_file}")
 
@@ -50,15 +131,194 @@ def calibrate_resistivity(input_folder, output_dir_detailed, output_dir_simplifi
             print("Temperature file does not exist.")
             return
 
-        temperature_dict = load_temperature_data(temperature_file)
-        print(f"Loaded temperature data: {temperature_dict}")
+        store = TemperatureStore.from_file(temperature_file)
+        print(f"Loaded {len(store)} temperature readings.")
 
-        if not temperature_dict:
+        if not len(store):
             print("Temperature data is empty or invalid.")
             return
 
-        process_files(input_folder, output_dir_detailed, output_dir_simplified, temperature_dict)
-        print("Resistivity calibration completed.")
+        # Each survey is matched with the temperatures interpolated to its time of day
+        results = process_files(input_folder, output_dir_detailed, output_dir_simplified, store,
+                                write_cache=write_cache, workers=workers, max_gap=max_gap)
+        succeeded = sum(result["status"] == "success" for result in results)
+        print(f"Resistivity calibration completed. {succeeded} of {len(results)} files calibrated.")
+        return results
     except Exception as e:
         print(f"Error during resistivity calibration: {e}")
 
+
+def _converted_sections(converter, electrode_data, measurements):
+    """
+    (header_lines, data) of a parsed survey, as calibrate_file reads them from the converted txt file.
+
+    The header is the electrode block and the "Number of data" line, and the data is built from the parsed
+    arrays, so any number of electrodes works. With the usual 48 electrodes this is exactly the 51 header
+    lines and the data section that read_converted_file returns for the converted file.
+    """
+    header_lines = [f"{len(electrode_data)}# Number of electrodes\n", "# x z\n"]
+    header_lines += [line + "\n" for line in electrode_data]
+    header_lines.append(f"{len(measurements)}# Number of data\n")
+    return header_lines, data_from_columns(converter.numeric_columns(electrode_data, measurements))
+
+
+def _process_single_survey(converter_class, input_folder, filename, output_dir_detailed, output_dir_simplified,
+                           profile_table, txt_folder=None, write_cache=False):
+    """Convert and calibrate one tx0 file in memory. Module level so process pool workers can pickle it."""
+    converter = converter_class(input_folder, txt_folder)
+    output_filename = converter.output_filename(filename)
+
+    def load():
+        electrode_data, measurements = converter.parse_file(filename)
+        if txt_folder:
+            output_file_path = os.path.join(txt_folder, output_filename)
+            converter.write_output_array(output_file_path, electrode_data, measurements)
+            if write_cache:
+                converter.write_cache_file(output_file_path, electrode_data, measurements)
+        return _converted_sections(converter, electrode_data, measurements)
+
+    return calibrate_survey(output_filename, load, output_dir_detailed, output_dir_simplified, profile_table,
+                            write_cache)
+
+
+def process_surveys(tx0_folder, temperature_file, output_dir_detailed, output_dir_simplified, converter_choice="1",
+                    workers=1, write_cache=False, txt_folder=None, filtered_temperature_file=None,
+                    incremental=False, max_gap=MAX_TEMPERATURE_GAP):
+    """
+    Convert, temperature-correct and save every tx0 file in tx0_folder in one pass.
+
+    Each survey is parsed, matched with the temperature profile interpolated to its time of day and
+    calibrated in memory; only the detailed and simplified outputs of calibrate_resistivity are written. Like the
+    staged pipeline, temperatures are only taken from the readings logged on the survey dates. For the
+    usual 48-electrode layout the result is the same as running convert_tx0_to_txt,
+    filter_temperature_data_by_date and calibrate_resistivity; other layouts, which the txt reader cannot
+    split, are calibrated from the parsed electrode block as well.
+
+    Args:
+    - tx0_folder: Directory containing the .tx0 files, optionally compressed
+    - temperature_file: Raw GNtemp temperature log
+    - output_dir_detailed: Directory for the detailed output files
+    - output_dir_simplified: Directory for the simplified output files
+    - converter_choice: "1" keeps the x/z columns, "2" drops them
+    - workers: Number of worker processes, 1 processes serially and None uses every core
+    - write_cache: Also write binary sidecars of the outputs (and of the txt files when they are kept)
+    - txt_folder: When given, the converted txt files are also written there
+    - filtered_temperature_file: When given, the temperature readings of the survey dates are also
+      written there, like filter_temperature_data_by_date
+    - incremental: Keep a manifest in output_dir_simplified and skip surveys whose tx0 content and
+      temperature log are unchanged since they were last calibrated and whose two outputs still exist
+    - max_gap: Longest logger gap survey temperatures are interpolated across, see survey_profile_table
+
+    Returns one calibrate_survey record per tx0 file in filename order, or None if the converter
+    choice is invalid or the temperature file cannot be read. In incremental mode, skipped surveys get
+    the status "unchanged".
+    """
+    converter_class = CONVERTERS.get(converter_choice)
+    if converter_class is None:
+        print("Invalid converter option. Please choose 1 or 2.")
+        return
+
+    try:
+        store = TemperatureStore.from_file(temperature_file)
+    except Exception as e:
+        print(f"Error loading temperature file {temperature_file}: {e}")
+        return
+
+    for folder in (output_dir_detailed, output_dir_simplified, txt_folder):
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    filenames = sorted(filename for filename in os.listdir(tx0_folder) if has_extension(filename, '.tx0'))
+    output_filenames = [converter_class(tx0_folder, txt_folder).output_filename(f) for f in filenames]
+    dates = sorted({str(survey_date(f)) for f in output_filenames if survey_date(f) is not None})
+    if filtered_temperature_file:
+        filter_temperature_data(temperature_file, dates, filtered_temperature_file)
+    # The readings filter_temperature_data_by_date keeps, so surveys near midnight or a gap in the log get the
+    # same profile as from calibrate_resistivity
+    store = store.select_days(dates)
+
+    results = {}
+    pending = list(zip(filenames, output_filenames))
+    if incremental:
+        manifest = ConversionManifest.load(output_dir_simplified, SURVEY_MANIFEST_NAME)
+        # Outputs of removed tx0 files are kept, only their entries are dropped
+        current = set(filenames)
+        manifest.entries = {f: entry for f, entry in manifest.entries.items() if f in current}
+        # Outputs also depend on the temperature log and how it is interpolated
+        settings = {"temperature": file_sha256(temperature_file),
+                    "max_gap": None if max_gap is None else str(pd.Timedelta(max_gap))}
+        pending = []
+        for filename, output_filename in zip(filenames, output_filenames):
+            if (manifest.is_up_to_date(filename, os.path.join(tx0_folder, filename), converter_class.__name__,
+                                       **settings)
+                    and os.path.exists(os.path.join(output_dir_detailed, output_filename))):
+                results[filename] = {"file": output_filename, "status": "unchanged", "rows": 0, "dropped": 0,
+                                     "elapsed": 0.0, "error": None}
+            else:
+                pending.append((filename, output_filename))
+        print(f"{len(results)} surveys unchanged since their last calibration, {len(pending)} to process.")
+
+    # Each task only carries the profile of its own survey
+    profile_table = survey_profile_table(store, [output_filename for _, output_filename in pending], max_gap)
+    tables = [{f: profile_table[f]} if f in profile_table else {} for _, f in pending]
+    arguments = ([filename for filename, _ in pending], [output_dir_detailed] * len(pending),
+                 [output_dir_simplified] * len(pending), tables, [txt_folder] * len(pending),
+                 [write_cache] * len(pending))
+    if workers == 1 or len(pending) < 2:
+        processed = [_process_single_survey(converter_class, tx0_folder, *task) for task in zip(*arguments)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            processed = list(executor.map(_process_single_survey, [converter_class] * len(pending),
+                                          [tx0_folder] * len(pending), *arguments))
+
+    for (filename, output_filename), result in zip(pending, processed):
+        results[filename] = result
+        if incremental and result["status"] == "success":
+            manifest.record(filename, os.path.join(tx0_folder, filename), output_filename, converter_class.__name__,
+                            **settings)
+    if incremental:
+        manifest.save()
+
+    results = [results[filename] for filename in filenames]
+    succeeded = sum(result["status"] == "success" for result in results)
+    print(f"Processing of tx0 files completed. {succeeded} of {len(results)} surveys calibrated.")
+    return results
+
+
+def build_survey_container(tx0_file, temperature_dict=None, export_folder=None):
+    """
+    Parse a tx0 file and hand it to pyGIMLi in memory, skipping the txt and corrected txt round trips.
+
+    Args:
+    - tx0_file: Path to the .tx0 file
+    - temperature_dict: TemperatureStore of the temperature log, or temperature data from
+      load_temperature_data; when given, the resistivities are corrected as process_files does, with
+      the profile at the survey's time of day or the first profile of its date respectively
+    - export_folder: Optional directory to also write the converted txt file to
+
+    Returns a pg.DataContainerERT that startInversion and water_computing accept in place of a path,
+    or None when temperature correction was requested but the survey has no temperature data.
+    """
+    # pyGIMLi is only needed here, keep it out of the import path of the conversion workers
+    from lib.ert_container import build_data_container
+
+    input_folder, filename = os.path.split(tx0_file)
+    converter = Tx0ToTxtConverter(input_folder, export_folder)
+    electrode_data, measurements = converter.parse_file(filename)
+
+    if export_folder:
+        converter.ensure_output_folder_exists()
+        converter.write_output_array(os.path.join(export_folder, converter.output_filename(filename)),
+                                     electrode_data, measurements)
+
+    temperatures = None
+    if temperature_dict is not None:
+        if isinstance(temperature_dict, TemperatureStore):
+            temperatures = survey_profile_table(temperature_dict, [filename]).get(filename)
+        else:
+            temperatures = temperatures_for_date(temperature_dict, survey_date(filename))
+        if temperatures is None:
+            print(f"No temperature data available for the date in {filename}")
+            return None
+
+    return build_data_container(electrode_data, measurements, temperatures)
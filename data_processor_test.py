@@ -0,0 +1,172 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from benchmarks import synthetic
+from data_processor import calibrate_resistivity, convert_tx0_to_txt, filter_temperature_data_by_date, process_surveys
+
+TX0_TEMPLATE = """* Electrode positions:
+* Electrode [  1]  =  0.000  0.000  0.000
+* Electrode [  2]  =  1.000  0.000  0.000
+* Electrode [  3]  =  2.000  0.000  0.000
+* Electrode [  4]  =  3.000  0.000  0.000
+* Remote electrode positions:
+******************* * Data *******************
+1 1 4 2 3 0.1 0.2 0.0 2.0 0.0 {rho} 0.0 1.0 1 1 1 1 -0.5 1.50 0.0 -0.750 x
+"""
+
+
+@pytest.fixture
+def tx0_folder(tmp_path):
+    input_folder = tmp_path / "tx0"
+    input_folder.mkdir()
+    for day in range(1, 7):
+        (input_folder / f"2022-07-0{day}_09-00-00.tx0").write_text(TX0_TEMPLATE.format(rho=100.0 * day),
+                                                                 encoding='utf-8')
+    # Malformed electrode index, the converter raises on int()
+    (input_folder / "2022-07-09_09-00-00.tx0").write_text(TX0_TEMPLATE.replace("1 1 4 2 3", "1 a 4 2 3"),
+                                                         encoding='utf-8')
+    return input_folder
+
+
+def read_folder(folder):
+    contents = {}
+    for filename in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, filename), 'rb') as f:
+            contents[filename] = f.read()
+    return contents
+
+
+def test_convert_tx0_to_txt_parallel_matches_serial(tx0_folder, tmp_path):
+    serial_results = convert_tx0_to_txt(str(tx0_folder), str(tmp_path / "serial"), "1")
+    parallel_results = convert_tx0_to_txt(str(tx0_folder), str(tmp_path / "parallel"), "1", workers=3)
+
+    assert serial_results == parallel_results
+    assert read_folder(tmp_path / "serial") == read_folder(tmp_path / "parallel")
+    assert len(read_folder(tmp_path / "parallel")) == 6
+
+
+def test_convert_tx0_to_txt_reports_failures(tx0_folder, tmp_path):
+    results = convert_tx0_to_txt(str(tx0_folder), str(tmp_path / "txt"), "2", workers=2)
+
+    statuses = {result["file"]: result["status"] for result in results}
+    assert statuses.pop("2022-07-09_09-00-00.tx0") == "error"
+    assert set(statuses.values()) == {"success"}
+
+
+def test_convert_tx0_to_txt_invalid_choice(tx0_folder, tmp_path):
+    assert convert_tx0_to_txt(str(tx0_folder), str(tmp_path / "txt"), "3") is None
+
+
+def test_convert_tx0_to_txt_incremental(tx0_folder, tmp_path):
+    output_folder = tmp_path / "txt"
+    convert_tx0_to_txt(str(tx0_folder), str(output_folder), "1", incremental=True)
+    assert (output_folder / "conversion_manifest.json").exists()
+
+    # Unchanged inputs are skipped; the malformed one is retried because it never produced an output
+    results = convert_tx0_to_txt(str(tx0_folder), str(output_folder), "1", incremental=True)
+    statuses = {result["file"]: result["status"] for result in results}
+    assert statuses.pop("2022-07-09_09-00-00.tx0") == "error"
+    assert set(statuses.values()) == {"skipped"}
+
+    # Changed content is reconverted, removed sources lose their output
+    (tx0_folder / "2022-07-01_09-00-00.tx0").write_text(TX0_TEMPLATE.format(rho=12345.0), encoding='utf-8')
+    os.remove(tx0_folder / "2022-07-02_09-00-00.tx0")
+    results = convert_tx0_to_txt(str(tx0_folder), str(output_folder), "1", incremental=True)
+    statuses = {result["file"]: result["status"] for result in results}
+    assert statuses["2022-07-01_09-00-00.tx0"] == "success"
+    assert statuses["2022-07-03_09-00-00.tx0"] == "skipped"
+    assert not (output_folder / "2022-07-02_09-00-00.txt").exists()
+    assert "12345.0" in (output_folder / "2022-07-01_09-00-00.txt").read_text(encoding='utf-8')
+
+    # Switching converter invalidates every entry
+    results = convert_tx0_to_txt(str(tx0_folder), str(output_folder), "2", incremental=True)
+    assert "skipped" not in {result["status"] for result in results}
+
+
+def test_calibrate_resistivity_parallel_matches_serial(tmp_path):
+    synthetic.generate_survey_folder(tmp_path / "tx0", 3, quadrupole_count=50)
+    synthetic.generate_tx0_file(tmp_path / "tx0" / "2022-01-01_09-00-00.tx0", quadrupole_count=50)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    convert_tx0_to_txt(str(tmp_path / "tx0"), str(tmp_path / "txt"), "1")
+    filter_temperature_data_by_date(str(tmp_path / "txt"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "temp.txt"))
+
+    serial = calibrate_resistivity(str(tmp_path / "txt"), str(tmp_path / "serial_detailed"),
+                                   str(tmp_path / "serial_simplified"), str(tmp_path / "temp.txt"))
+    parallel = calibrate_resistivity(str(tmp_path / "txt"), str(tmp_path / "parallel_detailed"),
+                                     str(tmp_path / "parallel_simplified"), str(tmp_path / "temp.txt"), workers=2)
+
+    assert [(r["file"], r["status"], r["rows"], r["dropped"]) for r in serial] == [
+        ("2021-01-02_09-00-00.txt", "success", 50, 0),
+        ("2021-01-03_09-00-00.txt", "success", 50, 0),
+        ("2021-01-04_09-00-00.txt", "success", 50, 0),
+        ("2022-01-01_09-00-00.txt", "skipped", 0, 0),
+    ]
+    assert [{k: v for k, v in r.items() if k != "elapsed"} for r in parallel] == \
+        [{k: v for k, v in r.items() if k != "elapsed"} for r in serial]
+    assert read_folder(tmp_path / "parallel_detailed") == read_folder(tmp_path / "serial_detailed")
+    assert read_folder(tmp_path / "parallel_simplified") == read_folder(tmp_path / "serial_simplified")
+
+
+@pytest.mark.parametrize("first_survey", [datetime(2021, 1, 2, 9, 0, 0), datetime(2021, 1, 2, 23, 50, 0)])
+def test_process_surveys_matches_the_three_stages(tmp_path, first_survey):
+    # The last survey before midnight is interpolated from the readings of its own day only in both paths
+    synthetic.generate_survey_folder(tmp_path / "tx0", 3, start=first_survey, quadrupole_count=50)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    convert_tx0_to_txt(str(tmp_path / "tx0"), str(tmp_path / "txt"), "1")
+    filter_temperature_data_by_date(str(tmp_path / "txt"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "temp.txt"))
+    staged = calibrate_resistivity(str(tmp_path / "txt"), str(tmp_path / "staged_detailed"),
+                                   str(tmp_path / "staged_simplified"), str(tmp_path / "temp.txt"))
+
+    fused = process_surveys(str(tmp_path / "tx0"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "fused_detailed"),
+                            str(tmp_path / "fused_simplified"))
+
+    assert [(r["file"], r["status"], r["rows"]) for r in fused] == [(r["file"], r["status"], r["rows"]) for r in staged]
+    assert read_folder(tmp_path / "fused_detailed") == read_folder(tmp_path / "staged_detailed")
+    assert read_folder(tmp_path / "fused_simplified") == read_folder(tmp_path / "staged_simplified")
+
+
+def test_process_surveys_other_electrode_counts(tmp_path):
+    synthetic.generate_survey_folder(tmp_path / "tx0", 1, electrode_count=12, quadrupole_count=20)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+
+    results = process_surveys(str(tmp_path / "tx0"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "detailed"),
+                              str(tmp_path / "simplified"))
+
+    assert [(r["file"], r["status"], r["rows"]) for r in results] == [("2021-01-02_09-00-00.txt", "success", 20)]
+    lines = (tmp_path / "simplified" / "2021-01-02_09-00-00.txt").read_text().splitlines()
+    assert lines[0].startswith("12#") and lines[14].startswith("20#")
+    assert len(lines) == 16 + 20
+
+
+def test_process_surveys_incremental(tmp_path):
+    synthetic.generate_survey_folder(tmp_path / "tx0", 3, quadrupole_count=50)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    arguments = (str(tmp_path / "tx0"), str(tmp_path / "GNtemp.txt"), str(tmp_path / "detailed"),
+                 str(tmp_path / "simplified"))
+
+    first = process_surveys(*arguments, incremental=True)
+    assert {r["status"] for r in first} == {"success"}
+    assert (tmp_path / "simplified" / "survey_manifest.json").exists()
+    outputs = read_folder(tmp_path / "detailed")
+
+    # Nothing changed, nothing is processed again
+    second = process_surveys(*arguments, incremental=True)
+    assert [(r["file"], r["status"]) for r in second] == [(r["file"], "unchanged") for r in first]
+    assert read_folder(tmp_path / "detailed") == outputs
+
+    # A changed survey or a missing output is processed again, a changed temperature log reprocesses all
+    synthetic.generate_tx0_file(tmp_path / "tx0" / "2021-01-02_09-00-00.tx0", quadrupole_count=50, seed=7)
+    os.remove(tmp_path / "detailed" / "2021-01-03_09-00-00.txt")
+    third = process_surveys(*arguments, incremental=True)
+    assert [r["status"] for r in third] == ["success", "success", "unchanged"]
+
+    with open(tmp_path / "GNtemp.txt", 'a', encoding='utf-8') as f:
+        f.write("\n")
+    fourth = process_surveys(*arguments, incremental=True)
+    assert {r["status"] for r in fourth} == {"success"}
+
+    # So does another max_gap
+    fifth = process_surveys(*arguments, incremental=True, max_gap="6h")
+    assert {r["status"] for r in fifth} == {"success"}
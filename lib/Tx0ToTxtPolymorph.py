@@ -9,54 +9,115 @@ Refactor notes: Added polymorphism to lower the repeat code use, Integrate 3 fil
 
 import os
 
+import numpy as np
+
+from lib.compressed_io import open_text, strip_compression_suffix
+from lib.survey_cache import numeric_column, parse_electrode_positions, write_survey_cache
+
+ELECTRODE_RECORD = 'electrode'
+MEASUREMENT_RECORD = 'measurement'
+
+# Electrode section states for iter_records, in the order they appear in a tx0 file
+_HEADER = 0
+_ELECTRODES = 1
+_DONE = 2
+
+# Data rows with fewer fields than this are skipped
+MIN_MEASUREMENT_FIELDS = 22
+
 
 class Tx0ToTxtConverter:
-    def __init__(self, input_folder, output_folder):
+    # (name, tx0 column) pairs kept by the vectorized parser, and the header of the matching output column
+    MEASUREMENT_COLUMNS = (('a', 1), ('b', 2), ('m', 3), ('n', 4), ('rho', 10), ('x', 18), ('z', 20))
+    MEASUREMENT_HEADER = "# a b m n rhoa x z"
+
+    def __init__(self, input_folder, output_folder, vectorized=True, write_cache=False):
         self.input_folder = input_folder
         self.output_folder = output_folder
+        self.vectorized = vectorized
+        # Also write the binary sidecar of lib.survey_cache next to each txt file (vectorized path only)
+        self.write_cache = write_cache
 
     def ensure_output_folder_exists(self):
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
 
-    def read_input_file(self, filename):
+    def open_input_file(self, filename):
         input_file_path = os.path.join(self.input_folder, filename)
-        with open(input_file_path, 'r', encoding='utf-8') as input_file:
+        return open_text(input_file_path, encoding='utf-8')
+
+    def read_input_file(self, filename):
+        with self.open_input_file(filename) as input_file:
             return input_file.readlines()
 
-    def process_electrode_data(self, lines):
-        electrode_data = []
-        electrode_start = False
+    def iter_section_lines(self, lines):
+        """
+        Single-pass state machine over the lines of a tx0 file.
+
+        Yields (ELECTRODE_RECORD, line) for every electrode position line and
+        (MEASUREMENT_RECORD, line) for every non-comment line of the data section.
+        `lines` can be any iterable, so an open file handle is consumed line by line
+        without loading the whole file.
+        """
+        electrode_state = _HEADER
+        in_data = False
         for line in lines:
-            if '* Electrode positions' in line:
-                electrode_start = True
+            if in_data and line.strip() and not line.startswith('*'):
+                yield MEASUREMENT_RECORD, line
                 continue
-            if '* Remote electrode positions' in line:
-                break
-            if electrode_start and '* Electrode [' in line:
-                parts = line.split('=')[1].strip().split()
-                if len(parts) >= 3:
-                    x = parts[0].strip()
-                    z = parts[2].strip()
-                    electrode_data.append(f"{x}     {z}")
-        return electrode_data
+
+            if '* Data' in line and '*******************' in line:
+                in_data = True
+
+            if electrode_state == _HEADER:
+                if '* Electrode positions' in line:
+                    electrode_state = _ELECTRODES
+                elif '* Remote electrode positions' in line:
+                    electrode_state = _DONE
+            elif electrode_state == _ELECTRODES:
+                if '* Remote electrode positions' in line:
+                    electrode_state = _DONE
+                elif '* Electrode [' in line:
+                    yield ELECTRODE_RECORD, line
+
+    def iter_records(self, lines):
+        """
+        Yields (ELECTRODE_RECORD, "x     z") for every electrode position and
+        (MEASUREMENT_RECORD, record) for every data row, where record is whatever
+        format_measurement_data returns.
+        """
+        for kind, line in self.iter_section_lines(lines):
+            if kind == ELECTRODE_RECORD:
+                record = self.parse_electrode_line(line)
+            else:
+                record = self.parse_measurement_line(line)
+            if record is not None:
+                yield kind, record
+
+    def parse_electrode_line(self, line):
+        """Parses one '* Electrode [i] = x y z' line, returns None if it is incomplete."""
+        parts = line.split('=')[1].strip().split()
+        if len(parts) < 3:
+            return None
+        x = parts[0].strip()
+        z = parts[2].strip()
+        return f"{x}     {z}"
+
+    def parse_measurement_line(self, line):
+        """Parses one data row, returns None for rows with fewer than 22 fields."""
+        parts = line.split()
+        if len(parts) < MIN_MEASUREMENT_FIELDS:
+            return None
+        a, b, m, n = int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4])
+        rho = parts[10]
+        return self.format_measurement_data(a, b, m, n, rho, parts)
+
+    def process_electrode_data(self, lines):
+        return [record for kind, record in self.iter_records(lines) if kind == ELECTRODE_RECORD]
 
     def process_measurement_data(self, lines):
         """This method is shared and parses common data fields."""
-        measurement_data = []
-        measurement_start = False
-        for line in lines:
-            if '* Data' in line and '*******************' in line:
-                measurement_start = True
-                continue
-            if measurement_start and line.strip() and not line.startswith('*'):
-                parts = line.split()
-                if len(parts) < 22:
-                    continue
-                a, b, m, n = int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4])
-                rho = parts[10]
-                measurement_data.append(self.format_measurement_data(a, b, m, n, rho, parts))
-        return measurement_data
+        return [record for kind, record in self.iter_records(lines) if kind == MEASUREMENT_RECORD]
 
     def correct_offsets(self, measurement_data):
         """Corrects the offset of electrode indices to start from 1 based on actual data."""
@@ -73,6 +134,68 @@ class Tx0ToTxtConverter:
 
         return corrected_data  # Return the initialized list
 
+    def measurement_dtype(self):
+        """Electrode indices are integers, values are kept as their tx0 text so the output is unchanged."""
+        return np.dtype([(name, 'i8' if name in 'abmn' else 'U32') for name, _ in self.MEASUREMENT_COLUMNS])
+
+    def parse_measurement_array(self, data_lines):
+        """
+        Parses the whole data section into one structured array (see MEASUREMENT_COLUMNS).
+
+        The block is read with a single np.loadtxt call. The last required field is loaded as
+        well, so any row with fewer than 22 fields makes the fast path fail; the block is then
+        re-read without those rows, which matches parse_measurement_line.
+        """
+        dtype = self.measurement_dtype()
+        if not data_lines:
+            return np.empty(0, dtype=dtype)
+        try:
+            return self._load_measurement_block(data_lines, dtype)
+        except ValueError:
+            well_formed = [line for line in data_lines if len(line.split()) >= MIN_MEASUREMENT_FIELDS]
+            if not well_formed:
+                return np.empty(0, dtype=dtype)
+            return self._load_measurement_block(well_formed, dtype)
+
+    def _load_measurement_block(self, data_lines, dtype):
+        usecols = [column for _, column in self.MEASUREMENT_COLUMNS] + [MIN_MEASUREMENT_FIELDS - 1]
+        block_dtype = np.dtype(dtype.descr + [('_last', 'U1')])
+        block = np.loadtxt(data_lines, dtype=block_dtype, usecols=usecols, comments=None, ndmin=1)
+        return block[list(dtype.names)].astype(dtype)
+
+    def correct_offsets_array(self, measurements):
+        """Vectorized correct_offsets: shifts the electrode indices in place so the smallest a is 1."""
+        if len(measurements):
+            offset = measurements['a'].min() - 1
+            for name in 'abmn':
+                measurements[name] -= offset
+        return measurements
+
+    def format_measurement_block(self, measurements):
+        """Formats all rows with one %-template, space separated like format_corrected_data."""
+        names = measurements.dtype.names
+        row_format = ' '.join('%d' if measurements.dtype[name].kind == 'i' else '%s' for name in names)
+        columns = [measurements[name].tolist() for name in names]
+        return '\n'.join(map(row_format.__mod__, zip(*columns)))
+
+    def parse_file(self, filename):
+        """
+        Reads a tx0 file once and returns (electrode_data, measurements), where measurements is the
+        offset-corrected structured array from parse_measurement_array.
+        """
+        electrode_data = []
+        data_lines = []
+        with self.open_input_file(filename) as input_file:
+            for kind, line in self.iter_section_lines(input_file):
+                if kind == ELECTRODE_RECORD:
+                    record = self.parse_electrode_line(line)
+                    if record is not None:
+                        electrode_data.append(record)
+                else:
+                    data_lines.append(line)
+        measurements = self.parse_measurement_array(data_lines)
+        return electrode_data, self.correct_offsets_array(measurements)
+
     def format_measurement_data(self, a, b, m, n, rho, parts):
         """Formats the measurement data for writing, including x and z coordinates."""
         x = parts[18]
@@ -96,18 +219,63 @@ class Tx0ToTxtConverter:
             for line in measurement_data:
                 output_file.write(line + "\n")
 
+    def format_output(self, electrode_data, measurements):
+        """The converted txt file as one string, same layout as write_output_file."""
+        lines = [f"{len(electrode_data)}# Number of electrodes", "# x z"]
+        lines.extend(electrode_data)
+        lines.append(f"{len(measurements)}# Number of data")
+        lines.append(self.MEASUREMENT_HEADER)
+        if len(measurements):
+            lines.append(self.format_measurement_block(measurements))
+        return '\n'.join(lines) + '\n'
+
+    def write_output_array(self, output_file_path, electrode_data, measurements):
+        """Same layout as write_output_file, written with a single bulk write."""
+        with open(output_file_path, 'w', encoding='utf-8') as output_file:
+            output_file.write(self.format_output(electrode_data, measurements))
+
+    def numeric_columns(self, electrode_data, measurements):
+        """Electrode positions and measurement columns, with rho/x/z typed the way pandas reads them."""
+        columns = {'electrodes': parse_electrode_positions(electrode_data)}
+        for name in measurements.dtype.names:
+            values = measurements[name]
+            columns[name] = numeric_column(values) if values.dtype.kind == 'U' else values
+        return columns
+
+    def write_cache_file(self, output_file_path, electrode_data, measurements):
+        """Writes the binary sidecar of a converted file."""
+        write_survey_cache(output_file_path, self.numeric_columns(electrode_data, measurements))
+
+    def output_filename(self, filename):
+        return strip_compression_suffix(filename).replace('.tx0', '.txt')
+
     def process_file(self, filename):
-        lines = self.read_input_file(filename)
-        electrode_data = self.process_electrode_data(lines)
-        measurement_data = self.process_measurement_data(lines)
+        output_file_path = os.path.join(self.output_folder, self.output_filename(filename))
+        if self.vectorized:
+            electrode_data, measurements = self.parse_file(filename)
+            self.write_output_array(output_file_path, electrode_data, measurements)
+            if self.write_cache:
+                self.write_cache_file(output_file_path, electrode_data, measurements)
+            print(f"Data extraction and conversion completed for {filename}.")
+            return
+
+        electrode_data = []
+        measurement_data = []
+        with self.open_input_file(filename) as input_file:
+            for kind, record in self.iter_records(input_file):
+                if kind == ELECTRODE_RECORD:
+                    electrode_data.append(record)
+                else:
+                    measurement_data.append(record)
         measurement_data = self.correct_offsets(measurement_data)  # Correct offsets to start from 1
-        output_file_name = filename.replace('.tx0', '.txt')
-        output_file_path = os.path.join(self.output_folder, output_file_name)
         self.write_output_file(output_file_path, electrode_data, measurement_data)
         print(f"Data extraction and conversion completed for {filename}.")
 
 
 class NoXZTx0ToTxtConverter(Tx0ToTxtConverter):
+    MEASUREMENT_COLUMNS = (('a', 1), ('b', 2), ('m', 3), ('n', 4), ('rho', 10))
+    MEASUREMENT_HEADER = "# a b m n rhoa"
+
     def format_measurement_data(self, a, b, m, n, rho, parts):
         """Formats the measurement data without x and z coordinates."""
         return (a, b, m, n, rho)
@@ -0,0 +1,121 @@
+import bz2
+import gzip
+import lzma
+import os
+
+import pytest
+
+from lib.Tx0ToTxtPolymorph import (ELECTRODE_RECORD, MEASUREMENT_RECORD, NoXZTx0ToTxtConverter,
+                                   Tx0ToTxtConverter)
+
+SAMPLE_TX0 = """* Lippmann 4-point light
+* Electrode positions:
+* Electrode [  3]  =  0.000  0.000  0.000
+* Electrode [  4]  =  1.000  0.000  -0.100
+* Electrode [  5]  =  2.000  0.000  -0.200
+* Electrode [  6]  =  3.000  0.000  -0.300
+* Remote electrode positions:
+* Remote [  1]  =  0.000  0.000  0.000
+******************* * Data *******************
+* num A B M N I U dU U/I dU/I rho phi f n nAB Profile Spread PseudoZ X Y Z date
+1 3 6 4 5 0.1 0.2 0.0 2.0 0.0 893.760 0.0 1.0 1 1 1 1 -0.5 1.50 0.0 -0.750 x
+2 too short
+3 4 6 5 6 0.1 0.2 0.0 2.0 0.0 936.362 0.0 1.0 1 1 1 1 -0.5 2.00 0.0 -0.500 x
+
+"""
+
+EXPECTED_TXT = """4# Number of electrodes
+# x z
+0.000     0.000
+1.000     -0.100
+2.000     -0.200
+3.000     -0.300
+2# Number of data
+# a b m n rhoa x z
+1 4 2 3 893.760 1.50 -0.750
+2 4 3 4 936.362 2.00 -0.500
+"""
+
+
+@pytest.fixture
+def tx0_folder(tmp_path):
+    input_folder = tmp_path / "tx0"
+    input_folder.mkdir()
+    (input_folder / "2022-07-03_09-00-00.tx0").write_text(SAMPLE_TX0, encoding='utf-8')
+    return input_folder
+
+
+def test_iter_records_single_pass():
+    """The parser consumes a one-shot iterator, so it never needs the lines twice."""
+    converter = Tx0ToTxtConverter("", "")
+    records = list(converter.iter_records(iter(SAMPLE_TX0.splitlines(keepends=True))))
+
+    electrodes = [record for kind, record in records if kind == ELECTRODE_RECORD]
+    measurements = [record for kind, record in records if kind == MEASUREMENT_RECORD]
+    assert electrodes == ["0.000     0.000", "1.000     -0.100", "2.000     -0.200", "3.000     -0.300"]
+    assert measurements == [(3, 6, 4, 5, "893.760", "1.50", "-0.750"), (4, 6, 5, 6, "936.362", "2.00", "-0.500")]
+
+
+def test_process_file(tx0_folder, tmp_path):
+    output_folder = tmp_path / "txt"
+    converter = Tx0ToTxtConverter(str(tx0_folder), str(output_folder))
+    converter.ensure_output_folder_exists()
+    converter.process_file("2022-07-03_09-00-00.tx0")
+
+    with open(os.path.join(output_folder, "2022-07-03_09-00-00.txt"), encoding='utf-8') as f:
+        assert f.read() == EXPECTED_TXT
+
+
+def test_process_file_without_xz(tx0_folder, tmp_path):
+    output_folder = tmp_path / "txt"
+    converter = NoXZTx0ToTxtConverter(str(tx0_folder), str(output_folder))
+    converter.ensure_output_folder_exists()
+    converter.process_file("2022-07-03_09-00-00.tx0")
+
+    with open(os.path.join(output_folder, "2022-07-03_09-00-00.txt"), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[-3:] == ["# a b m n rhoa", "1 4 2 3 893.760", "2 4 3 4 936.362"]
+
+
+@pytest.mark.parametrize("converter_class", [Tx0ToTxtConverter, NoXZTx0ToTxtConverter])
+def test_vectorized_output_matches_line_parser(tx0_folder, tmp_path, converter_class):
+    outputs = []
+    for vectorized in (True, False):
+        output_folder = tmp_path / f"txt_{vectorized}"
+        converter = converter_class(str(tx0_folder), str(output_folder), vectorized=vectorized)
+        converter.ensure_output_folder_exists()
+        converter.process_file("2022-07-03_09-00-00.tx0")
+        outputs.append((output_folder / "2022-07-03_09-00-00.txt").read_bytes())
+    assert outputs[0] == outputs[1]
+
+
+def test_parse_measurement_array_skips_short_rows():
+    converter = Tx0ToTxtConverter("", "")
+    data_lines = [line for kind, line in converter.iter_section_lines(SAMPLE_TX0.splitlines(keepends=True))
+                  if kind == MEASUREMENT_RECORD]
+    measurements = converter.correct_offsets_array(converter.parse_measurement_array(data_lines))
+
+    assert measurements.dtype.names == ('a', 'b', 'm', 'n', 'rho', 'x', 'z')
+    assert measurements['a'].tolist() == [1, 2]
+    assert measurements['rho'].tolist() == ["893.760", "936.362"]
+
+
+@pytest.mark.parametrize("module, filename", [
+    (gzip, "2022-07-03_09-00-00.tx0.gz"),
+    (lzma, "2022-07-03_09-00-00.tx0.xz"),
+    (bz2, "2022-07-03_09-00-00.tx0.bz2"),
+    (gzip, "2022-07-03_09-00-00.tx0"),  # Compressed without a suffix, detected from the magic bytes
+])
+def test_process_compressed_file(tmp_path, module, filename):
+    input_folder = tmp_path / "tx0"
+    input_folder.mkdir()
+    with module.open(input_folder / filename, 'wt', encoding='utf-8') as f:
+        f.write(SAMPLE_TX0)
+
+    output_folder = tmp_path / "txt"
+    converter = Tx0ToTxtConverter(str(input_folder), str(output_folder))
+    converter.ensure_output_folder_exists()
+    converter.process_file(filename)
+
+    with open(os.path.join(output_folder, "2022-07-03_09-00-00.txt"), encoding='utf-8') as f:
+        assert f.read() == EXPECTED_TXT
@@ -0,0 +1,56 @@
+"""
+Transparent reading of gzip, xz and bzip2 compressed inputs.
+
+Archived tx0 files and temperature logs can stay compressed on disk (e.g. "2022-07-03_09-00-00.tx0.gz");
+open_text decompresses them on the fly while they are read, so no scratch copy is needed.
+"""
+
+import bz2
+import gzip
+import lzma
+
+COMPRESSION_SUFFIXES = {
+    '.gz': gzip,
+    '.xz': lzma,
+    '.bz2': bz2,
+}
+
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', gzip),
+    (b'\xfd7zXZ\x00', lzma),
+    (b'BZh', bz2),
+]
+
+
+def strip_compression_suffix(filename):
+    """'survey.tx0.gz' -> 'survey.tx0', other names are returned unchanged."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if filename.lower().endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def has_extension(filename, extension):
+    """True if filename ends with extension, optionally followed by a compression suffix."""
+    return strip_compression_suffix(filename).endswith(extension)
+
+
+def detect_compression(file_path):
+    """Returns the module (gzip, lzma or bz2) needed to read file_path, or None for plain files."""
+    for suffix, module in COMPRESSION_SUFFIXES.items():
+        if str(file_path).lower().endswith(suffix):
+            return module
+    with open(file_path, 'rb') as f:
+        head = f.read(6)
+    for magic, module in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return module
+    return None
+
+
+def open_text(file_path, encoding='utf-8'):
+    """Opens file_path for reading text, stream-decompressing it if it is compressed."""
+    module = detect_compression(file_path)
+    if module is None:
+        return open(file_path, 'r', encoding=encoding)
+    return module.open(file_path, 'rt', encoding=encoding)
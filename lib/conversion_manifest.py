@@ -0,0 +1,137 @@
+"""
+Manifest of converted tx0 files, stored in the txt output folder.
+
+Each entry records the source path, size, mtime and SHA-256 of a tx0 file together with the converter
+class and the txt file it produced, so repeated runs over a growing archive only convert new or changed
+files and drop outputs whose source has disappeared. Entries can carry further values an output depends on
+(process_surveys records the digest of the temperature log it calibrated with), and other manifests of the
+same format can live in the same folder under another name. Since an entry pins down everything its output
+was made from, it also identifies the output's content without hashing it again, see output_digest.
+"""
+
+import hashlib
+import json
+import os
+
+from lib.disk_cache import cache_key
+from lib.survey_cache import cache_path
+
+MANIFEST_NAME = 'conversion_manifest.json'
+SURVEY_MANIFEST_NAME = 'survey_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Hash a file in fixed-size chunks so large inputs are never read into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_digest(output_path, names=(MANIFEST_NAME, SURVEY_MANIFEST_NAME)):
+    """
+    Digest identifying the content of output_path from the manifest of its folder, or None.
+
+    The digest combines the SHA-256 of the source and the converter and settings recorded for it, so it is
+    only returned while output_path is not newer than the manifest, i.e. was not rewritten or edited after
+    the run that recorded it.
+    """
+    folder, output_filename = os.path.split(os.path.abspath(output_path))
+    for name in names:
+        manifest_path = os.path.join(folder, name)
+        try:
+            if os.stat(output_path).st_mtime_ns > os.stat(manifest_path).st_mtime_ns:
+                continue
+        except OSError:
+            continue
+        for entry in ConversionManifest.load(folder, name).entries.values():
+            if entry.get('output') == output_filename:
+                recorded = {key: value for key, value in entry.items()
+                            if key not in ('path', 'size', 'mtime_ns', 'output')}
+                return cache_key(manifest=name, **recorded)
+    return None
+
+
+class ConversionManifest:
+    def __init__(self, output_folder, entries=None, name=MANIFEST_NAME):
+        self.output_folder = output_folder
+        self.name = name
+        self.path = os.path.join(output_folder, name)
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, output_folder, name=MANIFEST_NAME):
+        """Load the manifest from output_folder, starting empty if it is missing or unreadable."""
+        manifest_path = os.path.join(output_folder, name)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('version') == MANIFEST_VERSION:
+                return cls(output_folder, content.get('files', {}), name)
+            print(f"Ignoring manifest with unsupported version: {manifest_path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return cls(output_folder, name=name)
+
+    def save(self):
+        os.makedirs(self.output_folder, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def is_up_to_date(self, filename, input_path, converter_name, **extra):
+        """
+        Check whether filename was already converted from identical content with the same converter.
+
+        Size and mtime are compared first; the content hash is only computed when the size matches but
+        the mtime moved (e.g. the file was copied or touched), and the entry is refreshed if it still matches.
+        extra are further values the entry must have been recorded with, e.g. the digest of another input.
+        """
+        entry = self.entries.get(filename)
+        if entry is None or entry['converter'] != converter_name:
+            return False
+        if any(entry.get(key) != value for key, value in extra.items()):
+            return False
+        if not os.path.exists(os.path.join(self.output_folder, entry['output'])):
+            return False
+
+        stat = os.stat(input_path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if file_sha256(input_path) != entry['sha256']:
+            return False
+        entry['path'] = os.path.abspath(input_path)
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def record(self, filename, input_path, output_filename, converter_name, **extra):
+        stat = os.stat(input_path)
+        self.entries[filename] = {
+            'path': os.path.abspath(input_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(input_path),
+            'converter': converter_name,
+            'output': output_filename,
+            **extra,
+        }
+
+    def remove_stale(self, current_filenames):
+        """Delete outputs of every recorded input that is not in current_filenames, return the removed names."""
+        current_filenames = set(current_filenames)
+        removed = []
+        for filename in sorted(set(self.entries) - current_filenames):
+            output_path = os.path.join(self.output_folder, self.entries.pop(filename)['output'])
+            for path in (output_path, cache_path(output_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+                    print(f"Removed output of deleted source {filename}: {path}")
+            removed.append(filename)
+        return removed
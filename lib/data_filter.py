@@ -1,11 +1,15 @@
 import os
+import numpy as np
 import pandas as pd
 
+from lib.compressed_io import has_extension, open_text
+from lib.temperature_store import NS_PER_DAY, TemperatureStore, parse_times
+
 
 def extract_dates_from_filenames(data_dir):
     dates = []
     for filename in os.listdir(data_dir):
-        if filename.endswith('.txt') or filename.endswith('.tx0'):
+        if has_extension(filename, '.txt') or has_extension(filename, '.tx0'):
             parts = filename.split('_')
             if len(parts) >= 2:
                 file_type = parts[0]
@@ -34,28 +38,30 @@ def extract_dates_from_filenames(data_dir):
     return dates
 
 
-def filter_temperature_data(temperature_file, dates, output_file):
-    try:
-        # Load the original temperature data
-        temp_df = pd.read_csv(temperature_file, sep="\t", header=0, parse_dates=['time'], dayfirst=True)
-        print(f"Temperature data loaded successfully: {temp_df.head()}")
-
-        # Ensure the 'time' column is in datetime format
-        if not pd.api.types.is_datetime64_any_dtype(temp_df['time']):
-            temp_df['time'] = pd.to_datetime(temp_df['time'], errors='coerce')
-            print(f"Time column converted to datetime: {temp_df['time'].head()}")
+def filter_temperature_data(temperature_file, dates, output_file, chunksize=None):
+    """
+    Write the readings of temperature_file logged on any of dates to output_file.
 
-        # Check if there are any NaT values after conversion
-        if temp_df['time'].isnull().any():
-            print("Warning: Some 'time' values could not be converted to datetime. Check for malformed data.")
-            print(temp_df[temp_df['time'].isnull()])
+    Args:
+    - temperature_file: Raw GNtemp log, optionally gzip/xz/bzip2 compressed
+    - dates: 'YYYY-MM-DD' strings, e.g. from extract_dates_from_filenames
+    - output_file: Tab separated output with ISO times and an extra 'date' column
+    - chunksize: When given, the log is streamed chunksize rows at a time and matching rows are appended to
+      output_file as they are found, so memory stays bounded for logs of any length. Rows are then written
+      in log order rather than time order.
+    """
+    try:
+        if chunksize:
+            _filter_temperature_data_chunked(temperature_file, dates, output_file, chunksize)
+            return
 
-        # Convert dates to pandas datetime for matching
-        temp_df['date'] = temp_df['time'].dt.strftime('%Y-%m-%d')
-        print(f"Processed date column: {temp_df['date'].unique()}")
+        # Load the parsed temperature log, from its binary cache when the log is unchanged
+        store = TemperatureStore.from_file(temperature_file)
+        print(f"Temperature data loaded successfully: {len(store)} readings from {temperature_file}")
 
-        # Filter rows where the date is in the list of dates from the txt files
-        filtered_df = temp_df[temp_df['date'].isin(dates)]
+        # Keep the readings logged on the dates of the txt files
+        filtered_df = store.select_days(dates).to_frame()
+        filtered_df['date'] = filtered_df['time'].dt.strftime('%Y-%m-%d')
         print(f"Filtered data: {filtered_df.head()}")
 
         # Save the filtered temperature data
@@ -66,3 +72,20 @@ def filter_temperature_data(temperature_file, dates, output_file):
         print(f"Error during temperature data filtering: {e}")
 
 
+def _filter_temperature_data_chunked(temperature_file, dates, output_file, chunksize):
+    wanted_days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    total_rows = matched_rows = 0
+    with open_text(temperature_file) as f, open(output_file, 'w', encoding='utf-8', newline='') as out:
+        for chunk in pd.read_csv(f, sep="\t", dtype=str, chunksize=chunksize):
+            total_rows += len(chunk)
+            times = parse_times(chunk.iloc[:, 0])
+            # Compare integer day numbers; NaT becomes the minimum int64 and never matches
+            days = times.to_numpy(dtype='datetime64[ns]').view(np.int64) // NS_PER_DAY
+            keep = np.isin(days, wanted_days) & times.notna().to_numpy()
+
+            matched = chunk.iloc[:, 1:][keep].apply(pd.to_numeric, errors='coerce')
+            matched.insert(0, 'time', times[keep])
+            matched['date'] = matched['time'].dt.strftime('%Y-%m-%d')
+            matched.to_csv(out, sep="\t", index=False, header=(total_rows == len(chunk)))
+            matched_rows += len(matched)
+    print(f"Filtered {matched_rows} of {total_rows} temperature readings into {output_file}")
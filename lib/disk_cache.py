@@ -0,0 +1,111 @@
+"""
+Directory of cache entries named by a hash of their parameters, bounded by total size.
+
+Every entry is one file "<sha256 of key>.<suffix>". Reading an entry bumps its modification time, and
+after every write the least recently used entries are deleted until the directory is within max_bytes,
+so entries shared by several pipelines stay while one-off ones age out. The caches of the pipelines live
+in per-user folders under CACHE_ROOT, outside the repository.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_root():
+    """
+    Per-user cache folder: $ERT_CACHE_ROOT if set, else "SoilMapping" in $XDG_CACHE_HOME, in %LOCALAPPDATA% on
+    Windows or in ~/.cache.
+    """
+    if os.environ.get('ERT_CACHE_ROOT'):
+        return os.environ['ERT_CACHE_ROOT']
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base and os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA')
+    return os.path.join(base or os.path.join(os.path.expanduser('~'), '.cache'), 'SoilMapping')
+
+
+CACHE_ROOT = default_cache_root()
+
+
+def cache_key(**params):
+    """SHA-256 of the parameters, as JSON with sorted keys; tuples and lists hash the same."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory, suffix, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+        - directory: Cache folder, created on the first write
+        - suffix: File extension of the entries, e.g. 'bms'
+        - max_bytes: Total size of the entries kept after a write
+        """
+        self.directory = os.fspath(directory)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.{self.suffix}")
+
+    def get(self, key):
+        """Path of the entry of key, or None if it is not cached. Marks the entry as recently used."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, write):
+        """
+        Store an entry and return its path.
+
+        Args:
+        - key: Entry key, e.g. from cache_key
+        - write: Called with a temporary path to write the entry to; it is moved in place once written, so
+          concurrent readers never see a partial entry
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp.{self.suffix}"
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, f"*.{self.suffix}")):
+            if '.tmp.' in os.path.basename(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:  # removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Delete the least recently used entries until the cache is within max_bytes; never deletes keep."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not evict cache entry {path}: {e}")
+                continue
+            total -= size
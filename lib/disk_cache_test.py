@@ -0,0 +1,44 @@
+import os
+
+from lib.disk_cache import DiskCache, cache_key, default_cache_root
+
+
+def _write(size):
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    return write
+
+
+def test_cache_key_depends_on_every_parameter():
+    key = cache_key(start=[0, 0], end=[47, -8], quality=33.5, area=0.5)
+    assert key == cache_key(area=0.5, quality=33.5, end=(47, -8), start=(0, 0))
+    assert key != cache_key(start=[0, 0], end=[47, -8], quality=33.5, area=0.25)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "cache", 'bin', max_bytes=250)
+    assert cache.get('a') is None
+
+    for age, key in enumerate(['a', 'b']):
+        path = cache.put(key, _write(100))
+        os.utime(path, ns=(age * 10 ** 9, age * 10 ** 9))
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == cache.path('a')
+
+    cache.put('c', _write(100))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    # An entry larger than the whole cache is still kept until the next write
+    cache.put('d', _write(300))
+    assert [os.path.basename(path) for _, _, path in cache.entries()] == ['d.bin']
+
+
+def test_default_cache_root_is_per_user(tmp_path, monkeypatch):
+    monkeypatch.delenv('ERT_CACHE_ROOT', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+    assert default_cache_root() == str(tmp_path / "xdg" / "SoilMapping")
+
+    monkeypatch.setenv('ERT_CACHE_ROOT', str(tmp_path / "override"))
+    assert default_cache_root() == str(tmp_path / "override")
@@ -0,0 +1,101 @@
+"""
+Builds pyGIMLi ERT data containers directly from parsed tx0 arrays.
+
+The txt files written by Tx0ToTxtConverter and process_files are only needed for archiving; the inversion
+entry points accept the container returned here in place of a file path.
+"""
+
+import numpy as np
+import pandas as pd
+import pygimli as pg
+from pygimli.physics import ert
+
+from lib import survey_cache
+from lib.geometric_factors import geometric_factors
+from lib.resistivity_temperature_correction import correct_resistivity
+
+
+def parse_electrode_positions(electrode_data):
+    """Electrode positions as an (n, 2) float array, from "x     z" lines or an existing array."""
+    if isinstance(electrode_data, np.ndarray):
+        return electrode_data.astype(float).reshape(-1, 2)
+    return survey_cache.parse_electrode_positions(electrode_data)
+
+
+def build_data_container(electrode_data, measurements, temperatures=None):
+    """
+    Creates a pg.DataContainerERT from parsed survey arrays.
+
+    Args:
+    - electrode_data: Electrode lines from Tx0ToTxtConverter.parse_file, or an (n, 2) array of x, z
+    - measurements: Structured array (or dict of arrays) with 1-based a/b/m/n and rho, plus z for
+      temperature correction
+    - temperatures: Optional temperature profile at DEPTHS; when given rhoa is temperature corrected
+      exactly like the corrected_resistivity column of process_files
+
+    Rows whose resistivity, depth or corrected value is not a number are dropped, as process_files does.
+    """
+    electrodes = parse_electrode_positions(electrode_data)
+    resistivity = pd.to_numeric(pd.Series(measurements['rho']), errors='coerce').to_numpy(dtype=float)
+
+    if temperatures is not None:
+        names = measurements.dtype.names if isinstance(measurements, np.ndarray) else measurements.keys()
+        if 'z' not in names:
+            raise ValueError("Temperature correction needs the z column of the measurements.")
+        z = pd.to_numeric(pd.Series(measurements['z']), errors='coerce').to_numpy(dtype=float)
+        _, rhoa = correct_resistivity(resistivity, z, temperatures)
+    else:
+        rhoa = resistivity
+    keep = np.isfinite(rhoa)
+
+    data = pg.DataContainerERT()
+    for x, z in electrodes:
+        data.createSensor(pg.Pos(x, 0.0, z))
+    data.resize(int(keep.sum()))
+    for token in ('a', 'b', 'm', 'n'):
+        data.set(token, np.asarray(measurements[token][keep], dtype=float) - 1)  # pyGIMLi indices are 0-based
+    data.set('rhoa', rhoa[keep])
+    data.set('valid', np.ones(data.size()))
+    return data
+
+
+def load_cached_data_container(file_path):
+    """
+    Builds the container of a survey file from its binary sidecar (see lib.survey_cache).
+
+    Returns None when the file has no up-to-date sidecar, or the sidecar has no rhoa/rho column,
+    so the caller can let pyGIMLi parse the text file instead.
+    """
+    cached = survey_cache.load_survey_cache(file_path)
+    if cached is None:
+        return None
+    columns, _ = cached
+    rho_column = 'rhoa' if 'rhoa' in columns else 'rho'
+    if rho_column not in columns or 'electrodes' not in columns:
+        return None
+    print(f"Loading survey data from binary cache of {file_path}")
+    measurements = {token: columns[token] for token in ('a', 'b', 'm', 'n')}
+    measurements['rho'] = columns[rho_column]
+    return build_data_container(columns['electrodes'], measurements)
+
+
+def load_survey_data(file_path):
+    """
+    The data of a survey as a pg.DataContainerERT with negative resistivities removed, error estimates
+    and geometric factors, ready to invert. Shared by startInversion, water_computing and
+    time_lapse_inversion.
+
+    file_path is a processed survey file or a pg.DataContainerERT, which is copied.
+    """
+    if isinstance(file_path, pg.DataContainerERT):
+        data = pg.DataContainerERT(file_path)
+    else:
+        # Prefer the binary sidecar written by calibrate_resistivity(write_cache=True)
+        data = load_cached_data_container(file_path)
+        if data is None:
+            data = ert.load(file_path)
+    data.remove(data["rhoa"] < 0)  # Filter negative values
+    data["err"] = ert.estimateError(data, absoluteError=0.001, relativeError=0.03)
+    # Numerical k-factors, reused from the cache for quadrupoles seen in earlier surveys
+    data["k"] = geometric_factors(data)
+    return data
@@ -0,0 +1,47 @@
+import numpy as np
+from pygimli.physics import ert
+
+from benchmarks import synthetic
+from data_processor import build_survey_container, process_surveys
+from lib.ert_container import load_cached_data_container
+from lib.temperature_store import TemperatureStore
+
+# Six electrodes on a slope, so the sensor z positions are not all zero
+TOPOGRAPHY_TX0 = """* Electrode positions:
+* Electrode [   1] =      0.000      0.000     -0.000
+* Electrode [   2] =      2.000      0.000     -0.062
+* Electrode [   3] =      4.000      0.000     -0.250
+* Electrode [   4] =      6.000      0.000     -0.562
+* Electrode [   5] =      8.000      0.000     -1.000
+* Electrode [   6] =     10.000      0.000     -1.562
+* Remote electrode positions:
+******************* * Data *******************
+1 1 2 3 4 0.1 0.2 0.0 2.0 0.0 812.345 0.0 1.0 1 1 1 1 -0.5 2.50 0.0 -0.750 x
+2 2 3 4 5 0.1 0.2 0.0 2.0 0.0 96.125 0.0 1.0 1 1 1 1 -0.5 3.50 0.0 -1.250 x
+3 3 4 5 6 0.1 0.2 0.0 2.0 0.0 1503.0 0.0 1.0 1 1 1 1 -0.5 4.50 0.0 -3.250 x
+4 1 2 4 5 0.1 0.2 0.0 2.0 0.0 250.5 0.0 1.0 1 1 1 1 -0.5 2.50 0.0 -0.750 x
+"""
+
+
+def test_survey_container_matches_the_calibrated_file(tmp_path):
+    tx0_folder = tmp_path / "tx0"
+    tx0_folder.mkdir()
+    (tx0_folder / "2021-01-02_09-00-00.tx0").write_text(TOPOGRAPHY_TX0)
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    results = process_surveys(str(tx0_folder), str(tmp_path / "GNtemp.txt"), str(tmp_path / "detailed"),
+                              str(tmp_path / "simplified"), write_cache=True)
+    assert [r["status"] for r in results] == ["success"]
+
+    loaded = ert.load(str(tmp_path / "simplified" / "2021-01-02_09-00-00.txt"))
+    built = build_survey_container(str(tx0_folder / "2021-01-02_09-00-00.tx0"),
+                                   TemperatureStore.from_file(tmp_path / "GNtemp.txt", use_cache=False))
+    cached = load_cached_data_container(str(tmp_path / "simplified" / "2021-01-02_09-00-00.txt"))
+
+    for data in (built, cached):
+        np.testing.assert_allclose(np.array(data.sensorPositions()), np.array(loaded.sensorPositions()), atol=1e-9)
+        assert np.array(data.sensorPositions())[:, 2].min() == -1.562
+        for token in ('a', 'b', 'm', 'n'):
+            np.testing.assert_array_equal(np.array(data[token]), np.array(loaded[token]))
+        # The calibrated file rounds rhoa to two decimals
+        np.testing.assert_allclose(np.array(data['rhoa']), np.array(loaded['rhoa']), atol=0.005)
+    np.testing.assert_array_equal(np.array(loaded['a']), [0, 1, 2, 0])
@@ -0,0 +1,100 @@
+"""
+Disk cache of numerically computed geometric factors.
+
+ert.createGeometricFactors(data, numerical=True) runs a forward simulation on a refined mesh of the
+electrode layout, and pyGIMLi's own cache is keyed by the whole data container, apparent resistivities
+included, so it never hits across the surveys of a time-lapse series. The factor of a quadrupole only
+depends on the electrode positions and its a/b/m/n, so factors are stored per electrode layout as a table of
+quadrupoles, and only quadrupoles missing from the table are simulated.
+"""
+
+import os
+
+import numpy as np
+import pygimli as pg
+from pygimli.physics import ert
+
+from lib.disk_cache import CACHE_ROOT, DiskCache, cache_key
+
+GEOMETRIC_FACTOR_CACHE_VERSION = 1
+CACHE_DIR = os.environ.get('ERT_GEOMETRIC_FACTOR_CACHE', os.path.join(CACHE_ROOT, 'geometric_factors'))
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def layout_key(sensor_positions):
+    positions = np.ascontiguousarray(sensor_positions, dtype=np.float64)
+    return cache_key(version=GEOMETRIC_FACTOR_CACHE_VERSION, pygimli=pg.__version__,
+                     sensors=positions.round(6).tolist())
+
+
+def quadrupole_codes(a, b, m, n, sensor_count):
+    """One int64 per quadrupole from its 0-based a/b/m/n; -1 (pole configurations) is allowed."""
+    base = sensor_count + 1
+    codes = np.zeros(len(a), dtype=np.int64)
+    for index in (a, b, m, n):
+        codes = codes * base + (np.asarray(index, dtype=np.int64) + 1)
+    return codes
+
+
+def _load_table(path):
+    try:
+        with np.load(path, allow_pickle=False) as table:
+            return table['codes'], table['k']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable geometric factor cache {path}: {e}")
+        return None
+
+
+def _compute(sensor_positions, quadrupoles):
+    scheme = pg.DataContainerERT()
+    for x, y, z in sensor_positions:
+        scheme.createSensor(pg.Pos(x, y, z))
+    scheme.resize(len(quadrupoles))
+    for token, values in zip(('a', 'b', 'm', 'n'), quadrupoles.T):
+        scheme.set(token, values.astype(float))
+    # skipCache: pyGIMLi would store one never-reused copy per survey
+    return np.array(ert.createGeometricFactors(scheme, numerical=True, skipCache=True))
+
+
+def geometric_factors(data, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    Numerical geometric factors of every quadrupole of data, the same values as
+    ert.createGeometricFactors(data, numerical=True).
+
+    Args:
+    - data: pg.DataContainerERT
+    - cache_dir: Cache folder, CACHE_DIR by default
+    - max_bytes: Total size of the cache folder kept after adding factors
+    """
+    sensor_positions = np.array(data.sensorPositions())
+    quadrupoles = np.column_stack([np.array(data[token], dtype=np.int64) for token in ('a', 'b', 'm', 'n')])
+    codes = quadrupole_codes(*quadrupoles.T, len(sensor_positions))
+
+    cache = DiskCache(cache_dir or CACHE_DIR, 'npz', max_bytes)
+    key = layout_key(sensor_positions)
+    path = cache.get(key)
+    table = _load_table(path) if path is not None else None
+    cached_codes, cached_k = table if table is not None else (np.empty(0, dtype=np.int64), np.empty(0))
+
+    position = np.searchsorted(cached_codes, codes).clip(0, max(len(cached_codes) - 1, 0))
+    found = (cached_codes[position] == codes) if len(cached_codes) else np.zeros(len(codes), dtype=bool)
+    k = np.empty(len(codes))
+    k[found] = cached_k[position[found]]
+    if found.all():
+        return k
+
+    missing_codes, first = np.unique(codes[~found], return_index=True)
+    missing = np.flatnonzero(~found)[first]
+    print(f"Computing geometric factors of {len(missing)} new quadrupoles "
+          f"({int(found.sum())} of {len(codes)} from cache)")
+    missing_k = _compute(sensor_positions, quadrupoles[missing])
+    k[~found] = missing_k[np.searchsorted(missing_codes, codes[~found])]
+
+    merged_codes = np.concatenate([cached_codes, missing_codes])
+    order = np.argsort(merged_codes, kind='stable')
+    merged_k = np.concatenate([cached_k, missing_k])[order]
+    try:
+        cache.put(key, lambda temp_path: np.savez(temp_path, codes=merged_codes[order], k=merged_k))
+    except OSError as e:
+        print(f"Could not cache geometric factors in {cache.directory}: {e}")
+    return k
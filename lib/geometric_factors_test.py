@@ -0,0 +1,39 @@
+import numpy as np
+from pygimli.physics import ert
+
+from lib import geometric_factors as gf
+from lib.ert_container import build_data_container
+
+ELECTRODES = np.column_stack([np.arange(12.0), np.zeros(12)])
+
+
+def _container(quadrupoles):
+    a, b, m, n = np.array(quadrupoles).T
+    return build_data_container(ELECTRODES, {'a': a, 'b': b, 'm': m, 'n': n, 'rho': np.full(len(a), 100.0)})
+
+
+def test_geometric_factors_reuse_cached_quadrupoles(tmp_path, monkeypatch):
+    first = _container([(1, 2, 3, 4), (2, 3, 4, 5), (1, 2, 5, 6)])
+    k = gf.geometric_factors(first, cache_dir=tmp_path)
+    expected = np.array(ert.createGeometricFactors(first, numerical=True, skipCache=True))
+    np.testing.assert_allclose(k, expected)
+
+    computed = []
+    compute = gf._compute
+    monkeypatch.setattr(gf, '_compute', lambda positions, quadrupoles: computed.append(len(quadrupoles))
+                        or compute(positions, quadrupoles))
+
+    # Reordered with one new quadrupole: only that one is simulated
+    second = _container([(1, 2, 5, 6), (3, 4, 5, 6), (1, 2, 3, 4), (3, 4, 5, 6)])
+    k2 = gf.geometric_factors(second, cache_dir=tmp_path)
+    assert computed == [1]
+    np.testing.assert_allclose(k2[[0, 2]], k[[2, 0]])
+    assert k2[1] == k2[3]
+
+    assert np.array_equal(gf.geometric_factors(second, cache_dir=tmp_path), k2)
+    assert computed == [1]
+
+
+def test_quadrupole_codes_are_unique_with_poles():
+    codes = gf.quadrupole_codes([0, 0, 1], [1, -1, 0], [2, 2, 2], [3, 3, 3], 4)
+    assert len(set(codes.tolist())) == 3
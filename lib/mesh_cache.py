@@ -0,0 +1,59 @@
+"""
+Persistent cache of the inversion meshes, shared by DataInversion and WaterContent.
+
+All surveys on a line use the same world geometry and mesh settings, so the mesh is generated once per
+(start, end, quality, area) and later runs load the binary mesh instead of triangulating again. Meshes
+are stored in CACHE_DIR (override with the ERT_MESH_CACHE environment variable) and the least recently
+used ones are evicted once the folder exceeds MAX_CACHE_BYTES.
+"""
+
+import os
+
+import pygimli as pg
+import pygimli.meshtools as mt
+
+from lib.disk_cache import CACHE_ROOT, DiskCache, cache_key
+
+MESH_CACHE_VERSION = 1
+CACHE_DIR = os.environ.get('ERT_MESH_CACHE', os.path.join(CACHE_ROOT, 'meshes'))
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def mesh_key(start, end, quality, area):
+    """Cache key of a mesh; includes the pyGIMLi version since the mesher output may change with it."""
+    return cache_key(version=MESH_CACHE_VERSION, pygimli=pg.__version__,
+                     start=[float(v) for v in start], end=[float(v) for v in end],
+                     quality=float(quality), area=float(area))
+
+
+def build_mesh(start, end, quality, area):
+    geom = mt.createWorld(start=start, end=end, worldMarker=False)
+    return mt.createMesh(geom, quality=quality, area=area, smooth=True)
+
+
+def cached_mesh(start, end, quality, area, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    The mesh of a rectangular world, from the cache when it was built before with the same parameters.
+
+    Args:
+    - start, end: World corners [x, z]
+    - quality, area: Mesh quality and maximum cell area, see mt.createMesh
+    - cache_dir: Cache folder, CACHE_DIR by default
+    - max_bytes: Total size of the cache folder kept after adding a mesh
+    """
+    cache = DiskCache(cache_dir or CACHE_DIR, 'bms', max_bytes)
+    key = mesh_key(start, end, quality, area)
+
+    path = cache.get(key)
+    if path is not None:
+        try:
+            return pg.load(path)
+        except Exception as e:
+            print(f"Rebuilding unreadable cached mesh {path}: {e}")
+
+    mesh = build_mesh(start, end, quality, area)
+    try:
+        cache.put(key, mesh.saveBinaryV2)
+    except Exception as e:
+        print(f"Could not cache mesh in {cache.directory}: {e}")
+    return mesh
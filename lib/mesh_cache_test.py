@@ -0,0 +1,20 @@
+import os
+
+import numpy as np
+
+from lib.mesh_cache import build_mesh, cached_mesh
+
+
+def test_cached_mesh_matches_built_mesh(tmp_path):
+    built = build_mesh([0, 0], [23, -4], 33.5, 1.0)
+    first = cached_mesh([0, 0], [23, -4], 33.5, 1.0, cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+
+    loaded = cached_mesh([0, 0], [23, -4], 33.5, 1.0, cache_dir=tmp_path)
+    for mesh in (first, loaded):
+        assert mesh.cellCount() == built.cellCount()
+        np.testing.assert_allclose(np.array(mesh.positions()), np.array(built.positions()))
+        np.testing.assert_array_equal(mesh.boundaryMarkers(), built.boundaryMarkers())
+
+    cached_mesh([0, 0], [23, -4], 33.5, 2.0, cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 2
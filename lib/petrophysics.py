@@ -0,0 +1,115 @@
+"""
+Soil water content from inverted resistivity models.
+
+Water content follows the Archie-style calibration SWC = A * rho ** B of the temperature-corrected
+resistivity of every cell. Several (A, B) calibrations are evaluated at once as a (cells x calibrations)
+array, and inverted models are cached by the survey and inversion settings they came from, together with the
+figures of their inversion, so trying another calibration of a survey needs neither a new inversion nor
+pyGIMLi.
+"""
+
+import os
+
+import numpy as np
+
+from lib.conversion_manifest import file_sha256, output_digest
+from lib.disk_cache import CACHE_ROOT, DiskCache, cache_key
+
+DEFAULT_CALIBRATION = (246.47, -0.627)
+REFERENCE_TEMPERATURE = 25
+TEMPERATURE_COEFFICIENT = 0.025
+
+MODEL_CACHE_VERSION = 2
+CACHE_DIR = os.environ.get('ERT_MODEL_CACHE', os.path.join(CACHE_ROOT, 'models'))
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def correct_temperature(resistivity, cell_depths, temperature_points):
+    """
+    Resistivity corrected to REFERENCE_TEMPERATURE.
+
+    Args:
+    - resistivity: Resistivity of every cell
+    - cell_depths: Depth (z) of every cell center
+    - temperature_points: (depth, temperature) points of the temperature profile; cells between two points
+      get the linearly interpolated temperature, cells beyond them the temperature of the nearest point
+    """
+    point_depths, point_temperatures = np.array(sorted(temperature_points), dtype=float).T
+    temperatures = np.interp(cell_depths, point_depths, point_temperatures)
+    return np.asarray(resistivity, dtype=float) * (1 + TEMPERATURE_COEFFICIENT * (temperatures - REFERENCE_TEMPERATURE))
+
+
+def water_content(resistivity, calibrations):
+    """
+    Water content of every cell for every calibration, as a (cells x calibrations) array.
+
+    Args:
+    - resistivity: Temperature-corrected resistivity of every cell
+    - calibrations: (A, B) pairs
+    """
+    a, b = np.array(calibrations, dtype=float).reshape(-1, 2).T
+    return a * np.asarray(resistivity, dtype=float)[:, None] ** b
+
+
+def write_water_content(output_file, cell_centers, resistivity, calibrations, swc=None):
+    """
+    Write the water content of all calibrations to one tab separated file: x, z, resistivity, then one
+    SWC column per calibration, named "SWC_A=<A>_B=<B>". swc is computed when not given.
+    """
+    if swc is None:
+        swc = water_content(resistivity, calibrations)
+    cell_centers = np.asarray(cell_centers, dtype=float)
+    columns = ['x', 'z', 'resistivity'] + [f"SWC_A={a:g}_B={b:g}" for a, b in calibrations]
+    table = np.column_stack([cell_centers[:, 0], cell_centers[:, 1], resistivity, swc])
+    np.savetxt(output_file, table, fmt='%.6g', delimiter='\t', header='\t'.join(columns), comments='')
+    print(f"Water content of {len(calibrations)} calibrations saved to {output_file}")
+
+
+def model_key(survey_file, **settings):
+    """
+    Cache key of the model inverted from survey_file with settings (mesh and inversion parameters).
+
+    A survey written by an incremental conversion is identified by its manifest entry, other files are hashed.
+    """
+    survey = output_digest(survey_file) or file_sha256(survey_file)
+    return cache_key(version=MODEL_CACHE_VERSION, survey=survey, **settings)
+
+
+def save_model(key, model, figures=None, cache_dir=None):
+    """
+    Cache an inverted resistivity model, see model_key. Failing to write the cache is not an error.
+
+    Args:
+    - key: Cache key from model_key
+    - model: Resistivity of every cell
+    - figures: Mapping of names to the image files of the inversion, stored with the model
+    - cache_dir: Cache folder, CACHE_DIR by default
+    """
+    cache = DiskCache(cache_dir or CACHE_DIR, 'npz', MAX_CACHE_BYTES)
+    try:
+        arrays = {f"figure_{name}": np.fromfile(path, dtype=np.uint8) for name, path in (figures or {}).items()}
+        cache.put(key, lambda temp_path: np.savez(temp_path, model=np.asarray(model, dtype=float), **arrays))
+    except OSError as e:
+        print(f"Could not cache resistivity model in {cache.directory}: {e}")
+
+
+def load_model(key, figures=None, cache_dir=None):
+    """
+    The cached resistivity model of key, or None.
+
+    figures maps names to paths like in save_model: the figures cached with the model are written to them,
+    and a model cached without all of them counts as missing.
+    """
+    path = DiskCache(cache_dir or CACHE_DIR, 'npz').get(key)
+    if path is None:
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as cached:
+            if any(f"figure_{name}" not in cached for name in figures or {}):
+                return None
+            for name, figure_path in (figures or {}).items():
+                cached[f"figure_{name}"].tofile(figure_path)
+            return cached['model']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable cached model {path}: {e}")
+        return None
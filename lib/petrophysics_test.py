@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+from lib import petrophysics
+from lib.conversion_manifest import SURVEY_MANIFEST_NAME, ConversionManifest
+from lib.petrophysics import correct_temperature, load_model, model_key, save_model, water_content, write_water_content
+
+
+def test_water_content_evaluates_all_calibrations():
+    resistivity = np.array([100.0, 250.0, 1000.0])
+    calibrations = [(246.47, -0.627), (300.0, -0.7)]
+    swc = water_content(resistivity, calibrations)
+    assert swc.shape == (3, 2)
+    for column, (a, b) in enumerate(calibrations):
+        np.testing.assert_allclose(swc[:, column], a * resistivity ** b)
+
+
+def test_correct_temperature_interpolates_the_profile():
+    resistivity = np.full(4, 100.0)
+    corrected = correct_temperature(resistivity, [0.5, -1.0, -5.0, -20.0], [(-10, 15), (0, 25)])
+    # 25 degrees at and above the surface, 24 at -1 m, 20 at -5 m, 15 below -10 m
+    np.testing.assert_allclose(corrected, [100.0, 97.5, 87.5, 75.0])
+
+
+def _per_cell_correction(resistivity, cell_depths, temperature_points):
+    # The per-cell loop correct_temperature replaced in water_computing, without its skipped last cell
+    corrected = np.array(resistivity, dtype=float)
+    for j, y in enumerate(cell_depths):
+        T = 25.5
+        for i in range(len(temperature_points) - 1):
+            y1, T1 = temperature_points[i]
+            y2, T2 = temperature_points[i + 1]
+            if y1 <= y <= y2:
+                T = T1 + (T2 - T1) * ((y - y1) / (y2 - y1))
+                break
+            else:
+                T = T1 if y < y1 else T2
+        corrected[j] = (1 + 0.025 * (T - 25)) * corrected[j]
+    return corrected
+
+
+def test_correct_temperature_matches_per_cell_loop():
+    rng = np.random.default_rng(0)
+    resistivity = rng.uniform(10, 1000, 500)
+    # Two-point profiles over and beyond the cells, and a multi-point profile within them
+    for cell_depths, temperature_points in [
+        (rng.uniform(-8, 0, 500), [(-10, -5), (0, -5)]),
+        (rng.uniform(-20, 2, 500), [(-10, 12), (0, 21)]),
+        (rng.uniform(-8, 0, 500), [(-8, 11), (-3, 14), (-1, 18), (0, 21)]),
+    ]:
+        np.testing.assert_allclose(correct_temperature(resistivity, cell_depths, temperature_points),
+                                   _per_cell_correction(resistivity, cell_depths, temperature_points))
+
+
+def test_write_water_content(tmp_path):
+    output_file = tmp_path / "Water_content_survey.txt"
+    centers = np.array([[0.5, -0.25, 0.0], [1.5, -0.75, 0.0]])
+    write_water_content(output_file, centers, np.array([100.0, 200.0]), [(246.47, -0.627), (300, -0.7)])
+
+    lines = output_file.read_text().splitlines()
+    assert lines[0] == "x\tz\tresistivity\tSWC_A=246.47_B=-0.627\tSWC_A=300_B=-0.7"
+    table = np.loadtxt(output_file, skiprows=1)
+    np.testing.assert_allclose(table[:, 3], 246.47 * np.array([100.0, 200.0]) ** -0.627, rtol=1e-5)
+
+
+def test_model_cache_round_trip(tmp_path):
+    survey = tmp_path / "2022-07-03_09-00-00.txt"
+    survey.write_text("processed survey\n")
+    key = model_key(survey, quality=33.5, area=0.5, dphi=2)
+    assert load_model(key, cache_dir=tmp_path / "cache") is None
+
+    save_model(key, [120.5, 98.25], cache_dir=tmp_path / "cache")
+    np.testing.assert_array_equal(load_model(key, cache_dir=tmp_path / "cache"), [120.5, 98.25])
+    # A model cached without figures is not reused where its figures are needed
+    assert load_model(key, {"figure": tmp_path / "figure.png"}, cache_dir=tmp_path / "cache") is None
+
+    survey.write_text("processed survey, recalibrated\n")
+    assert model_key(survey, quality=33.5, area=0.5, dphi=2) != key
+
+
+def test_model_cache_restores_figures(tmp_path):
+    figure = tmp_path / "inversion_result_survey.png"
+    figure.write_bytes(b"\x89PNG lambda=10")
+    save_model("key", [120.5], {"figure": figure}, cache_dir=tmp_path / "cache")
+
+    figure.write_bytes(b"\x89PNG lambda=20")
+    np.testing.assert_array_equal(load_model("key", {"figure": figure}, cache_dir=tmp_path / "cache"), [120.5])
+    assert figure.read_bytes() == b"\x89PNG lambda=10"
+
+
+def test_model_key_reuses_the_manifest_digest(tmp_path, monkeypatch):
+    source = tmp_path / "2022-07-03_09-00-00.tx0"
+    source.write_text("raw survey\n")
+    survey = tmp_path / "2022-07-03_09-00-00.txt"
+    survey.write_text("processed survey\n")
+    hashed_key = model_key(survey, quality=33.5)
+
+    manifest = ConversionManifest(str(tmp_path), name=SURVEY_MANIFEST_NAME)
+    manifest.record(source.name, str(source), survey.name, "Tx0ToTxtConverter", temperature="abc")
+    manifest.save()
+    os.utime(survey, ns=(0, 0))
+    monkeypatch.setattr(petrophysics, "file_sha256", lambda path: pytest.fail(f"{path} was hashed"))
+    key = model_key(survey, quality=33.5)
+    assert key != hashed_key
+    assert model_key(survey, quality=30.0) != key
+
+    # A survey written after its manifest entry is hashed again
+    monkeypatch.undo()
+    os.utime(survey, ns=(2 ** 62, 2 ** 62))
+    assert model_key(survey, quality=33.5) == hashed_key
@@ -1,16 +1,32 @@
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+from lib.survey_cache import electrodes_from_header, load_survey_cache, write_survey_cache
+from lib.temperature_store import DailyTemperatureTable, TemperatureStore
+
+DEPTHS = [-4, -3.5, -3, -1.5, -1, -0.5]  # Logger depths of the six temperature columns
+SURVEY_TIME_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})')
+MAX_TEMPERATURE_GAP = pd.Timedelta(hours=3)  # Longest logger gap temperatures are interpolated across
+MAX_FALLBACK_DISTANCE = pd.Timedelta(days=1)  # Furthest a survey's nearest reading may be when none is within the gap
+HEADER_LINE_COUNT = 51  # Header lines copied from a converted file to the corrected outputs
+CONVERTED_COLUMNS = ['a', 'b', 'm', 'n', 'resistivity', 'x', 'z']
+CONVERTED_DTYPES = {'a': np.int64, 'b': np.int64, 'm': np.int64, 'n': np.int64,
+                    'resistivity': np.float64, 'x': np.float64, 'z': np.float64}
+
 
 def load_temperature_data(temperature_file):
+    """
+    Temperature readings grouped by day, as a DailyTemperatureTable: a read-only {datetime.date: readings
+    of that day} mapping backed by one array, or an empty dict if the file cannot be read.
+    """
     print(f"Loading temperature data from {temperature_file}")
     try:
-        temperature_data = pd.read_csv(temperature_file, sep="\t", parse_dates=['time'])
-        temperature_data['date'] = temperature_data['time'].dt.date
-        temperature_dict = {}
-        for date, group in temperature_data.groupby('date'):
-            temperature_dict[date] = group
+        temperature_dict = DailyTemperatureTable(TemperatureStore.from_file(temperature_file))
         print(f"Loaded temperature data for {len(temperature_dict)} days.")
         return temperature_dict
     except FileNotFoundError:
@@ -35,93 +51,373 @@ def apply_calibration(resistivity, temperature):
     return resistivity * (1 + 0.025 * (temperature - 25))
 
 
-def process_files(data_dir, output_dir, output_dir2, temperature_dict):
+def temperatures_for_date(temperature_dict, date):
+    """Returns the first temperature profile logged on `date`, or None if it is missing or malformed."""
+    if isinstance(temperature_dict, DailyTemperatureTable):
+        return temperature_dict.first_profile(date)
+    temp_data = temperature_dict.get(date)
+    if temp_data is None or temp_data.shape[1] < 7:  # Ensure there are at least 6 temperature columns
+        return None
+    return temp_data.iloc[0, 1:7].values.astype(float)
+
+
+def correct_resistivity(resistivity, z, temperatures, depths=DEPTHS):
     """
-    Process files in the input directory, apply temperature correction, and save the results.
+    Array version of interpolate_temperature + apply_calibration.
 
-    Args:
-    - data_dir: Directory containing input .txt files
-    - output_dir: Directory for detailed output files
-    - output_dir2: Directory for simplified output files
-    - temperature_dict: Dictionary containing temperature data grouped by date
+    Returns (interpolated_temperature, corrected_resistivity) for every (resistivity, z) pair.
+    np.interp clamps to the end temperatures like interpolate_temperature, and NaN depths or
+    temperatures propagate to a NaN corrected value.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(output_dir2, exist_ok=True)
+    resistivity = np.asarray(resistivity, dtype=float)
+    interpolated = np.interp(np.asarray(z, dtype=float), depths, np.asarray(temperatures, dtype=float))
+    return interpolated, resistivity * (1 + 0.025 * (interpolated - 25))
+
+
+def apply_temperature_correction(data, temperatures, depths=DEPTHS):
+    """
+    Adds the interpolated_temperature and corrected_resistivity columns to a data section with
+    numeric 'resistivity' and 'z' columns, in one pass over the whole file.
+    """
+    data['interpolated_temperature'], data['corrected_resistivity'] = correct_resistivity(
+        data['resistivity'].to_numpy(dtype=float), data['z'].to_numpy(dtype=float), temperatures, depths)
+    return data
+
+
+def data_from_columns(columns):
+    """
+    Data section built from converted numeric columns (see Tx0ToTxtConverter.numeric_columns), with the
+    same columns and dtypes as the pandas text path.
+    """
+    data = pd.DataFrame({name: np.array(columns[name]) for name in ('a', 'b', 'm', 'n')})
+    data['resistivity'] = np.array(columns['rho'])
+    for name in ('x', 'z'):
+        data[name] = np.array(columns[name]) if name in columns else np.nan
+    return data
+
+
+def read_cached_data(file_path):
+    """Data section of a converted file from its binary sidecar, or None if there is no up-to-date sidecar."""
+    cached = load_survey_cache(file_path)
+    if cached is None:
+        return None
+    columns, _ = cached
+    return data_from_columns(columns)
+
+
+def read_converted_file(file_path_or_buffer):
+    """
+    Header (first 51 lines) and data section (from line 53 on) of a converted txt file or text buffer.
+    Raises ValueError when line 52 is not the column header, e.g. for a file with another number of electrodes.
+
+    A file is opened once: the data section is parsed from the same handle right after the header, or
+    taken from an up-to-date binary sidecar of the file when there is one.
+    """
+    if isinstance(file_path_or_buffer, (str, os.PathLike)):
+        with open(file_path_or_buffer, 'r') as f:
+            return _read_converted_sections(f, file_path_or_buffer)
+    return _read_converted_sections(file_path_or_buffer)
+
+
+def _read_converted_sections(f, file_path=None):
+    header_lines = [f.readline() for _ in range(HEADER_LINE_COUNT)]
+    if not header_lines[-1]:
+        raise ValueError(f"File is shorter than its {HEADER_LINE_COUNT} header lines")
+
+    # Line 52 is the column header of the data section ("# a b m n rhoa x z"); anything else means the header
+    # has another length and the line may be a measurement, which must not be dropped
+    column_line = f.readline()
+    if column_line and not column_line.startswith('#'):
+        raise ValueError(f"Line {HEADER_LINE_COUNT + 1} is not the column header of the data section: "
+                         f"{column_line.strip()}")
+
+    if file_path is not None:
+        data = read_cached_data(file_path)
+        if data is not None:
+            return header_lines, data
+
+    # Typed fast path for single-space separated rows as written by Tx0ToTxtConverter, the general
+    # whitespace parse for anything else (e.g. non-numeric entries, which calibrate_survey turns into NaN)
+    data_start = f.tell()
+    try:
+        data = pd.read_csv(f, sep=' ', header=None, names=CONVERTED_COLUMNS, dtype=CONVERTED_DTYPES)
+    except ValueError:
+        f.seek(data_start)
+        data = pd.read_csv(f, sep=r'\s+', header=None, names=CONVERTED_COLUMNS)
+    return header_lines, data
+
+
+SIMPLIFIED_HEADER = "# a    b    m    n    rhoa\n"
+SIMPLIFIED_ROW_FORMAT = "%6d\t%6d\t%6d\t%6d\t%15.2f\n"
+
+
+def format_simplified_rows(data):
+    """Formats the a/b/m/n and corrected_resistivity columns of all rows with one %-template."""
+    columns = [data[name].tolist() for name in ('a', 'b', 'm', 'n', 'corrected_resistivity')]
+    return ''.join(map(SIMPLIFIED_ROW_FORMAT.__mod__, zip(*columns)))
+
+
+def write_simplified_output(output_file_path, header_lines, data):
+    """Writes the header and the simplified a/b/m/n/rhoa table with a single write."""
+    with open(output_file_path, 'w') as f:
+        f.write(''.join(header_lines) + SIMPLIFIED_HEADER + format_simplified_rows(data))
+
+
+def write_cached_outputs(output_file_path, output_file_path2, header_lines, data):
+    """Binary sidecars of the detailed and simplified outputs (see lib.survey_cache)."""
+    try:
+        electrodes = electrodes_from_header(header_lines)
+    except ValueError as e:
+        print(f"Skipping binary cache for {output_file_path}: {e}")
+        return
+
+    detailed = {'electrodes': electrodes}
+    for name in data.columns:
+        values = data[name].to_numpy()
+        detailed[name] = values.astype(float) if values.dtype == object else values
+    write_survey_cache(output_file_path, detailed)
+
+    # rhoa as written in the simplified text, i.e. rounded to two decimals
+    simplified = {'electrodes': electrodes}
+    simplified.update({name: data[name].to_numpy(dtype=np.int64) for name in ('a', 'b', 'm', 'n')})
+    simplified['rhoa'] = np.char.mod('%.2f', data['corrected_resistivity'].to_numpy(dtype=float)).astype(float)
+    write_survey_cache(output_file_path2, simplified)
+
+
+def survey_date(file_name):
+    """Date of a survey named "YYYY-MM-DD_...", None if the name does not start with a date."""
+    try:
+        return pd.to_datetime(file_name.split('_')[0]).date()
+    except ValueError:
+        return None
+
+
+def survey_time(file_name):
+    """Timestamp of a survey named "YYYY-MM-DD_HH-MM-SS...", None if the name has no time of day."""
+    match = SURVEY_TIME_PATTERN.match(file_name)
+    if match is None:
+        return None
+    try:
+        return pd.Timestamp(f"{match.group(1)} {match.group(2)}:{match.group(3)}:{match.group(4)}")
+    except ValueError:
+        return None
 
-    depths = [-4, -3.5, -3, -1.5, -1, -0.5]  # List of depths for temperature interpolation
 
-    for file_name in os.listdir(data_dir):
-        if file_name.endswith(".txt"):
-            file_path = os.path.join(data_dir, file_name)
-            print(f"Processing file: {file_name}")
+def temperature_profile_table(temperature_dict, file_names):
+    """
+    Compact {file name: temperature profile} table from a dict of load_temperature_data, using the first
+    reading of each survey's date. Surveys without data for their date are left out; the profile is None
+    for days without 6 temperature columns.
 
-            try:
-                # Step 1: Read file header (first 51 lines)
-                with open(file_path, 'r') as f:
-                    header_lines = [next(f) for _ in range(51)]
+    This is all process_files needs from the temperatures, and cheap to hand to worker processes.
+    """
+    table = {}
+    for file_name in file_names:
+        date = survey_date(file_name)
+        if date in temperature_dict:
+            table[file_name] = temperatures_for_date(temperature_dict, date)
+    return table
 
-                # Step 2: Read the data section and ensure numeric data types for 'resistivity' and 'z'
-                data = pd.read_csv(file_path, skiprows=52, delim_whitespace=True,
-                                   names=['a', 'b', 'm', 'n', 'resistivity', 'x', 'z'])
 
-                # Ensure that 'resistivity' and 'z' are numeric. Non-numeric entries will be converted to NaN.
-                data['z'] = pd.to_numeric(data['z'], errors='coerce')
-                data['resistivity'] = pd.to_numeric(data['resistivity'], errors='coerce')
+def survey_profile_table(store, file_names, max_gap=MAX_TEMPERATURE_GAP):
+    """
+    Compact {file name: temperature profile} table from a TemperatureStore.
 
-                # Drop rows where 'z' or 'resistivity' are NaN (invalid data)
-                data.dropna(subset=['z', 'resistivity'], inplace=True)
+    Surveys named "YYYY-MM-DD_HH-MM-SS..." get the profile linearly interpolated in time between the
+    two logger readings around the survey, all surveys in one vectorized lookup; readings more than
+    max_gap apart are not interpolated between and the nearer one is used. A survey without any reading
+    within max_gap gets the nearest reading of the log, with a warning, unless that is more than
+    MAX_FALLBACK_DISTANCE away. max_gap=None interpolates across gaps of any length. Surveys named by
+    date only get the first reading of their date, as with temperature_profile_table. Surveys without a
+    reading are left out; the profile is None when the log has fewer than 6 temperature columns.
+    """
+    if len(store.columns) < 6:
+        return {file_name: None for file_name in file_names if survey_date(file_name) is not None}
 
-                # Step 3: Extract the date from the filename
-                date_str = file_name.split('_')[0]
-                try:
-                    date = pd.to_datetime(date_str).date()
-                except ValueError:
-                    print(f"Date format error in file name: {file_name}")
+    timed = [(file_name, survey_time(file_name)) for file_name in file_names]
+    timed = [(file_name, time) for file_name, time in timed if time is not None]
+    table = {}
+    if timed and len(store):
+        profiles, found = store.interpolate([time for _, time in timed], max_gap)
+        if not found.all():
+            missing = np.flatnonzero(~found)
+            nearest = store.nearest_indices([timed[i][1] for i in missing])
+            for i, index in zip(missing, nearest):
+                file_name, survey = timed[i]
+                reading = pd.Timestamp(store.timestamps[index])
+                if abs(reading - survey) > MAX_FALLBACK_DISTANCE:
                     continue
+                print(f"Warning: no temperature reading within {max_gap} of {file_name}, using the nearest "
+                      f"reading at {reading} ({abs(reading - survey)} away)")
+                profiles[i] = store.temperatures[index]
+                found[i] = True
+        for (file_name, _), profile, ok in zip(timed, profiles[:, :6], found):
+            if ok:
+                table[file_name] = profile
+
+    timed_names = {file_name for file_name, _ in timed}
+    dated = {file_name: survey_date(file_name) for file_name in file_names if file_name not in timed_names}
+    dated = {file_name: date for file_name, date in dated.items() if date is not None}
+    if dated:
+        selected = store.select_days([str(date) for date in dated.values()])
+        days, first = np.unique(selected.day_numbers, return_index=True)
+        first_by_day = dict(zip(days.tolist(), first.tolist()))
+        for file_name, date in dated.items():
+            index = first_by_day.get(int(np.datetime64(date, 'D').astype(np.int64)))
+            if index is not None:
+                table[file_name] = selected.temperatures[index, :6]
+    return table
+
+
+def calibrate_file(file_path, output_dir, output_dir2, profile_table, write_cache=False):
+    """
+    Apply the temperature correction to one converted file and save both outputs.
+
+    Args:
+    - file_path: Converted .txt file named "YYYY-MM-DD_..."
+    - output_dir: Directory for the detailed output file
+    - output_dir2: Directory for the simplified output file
+    - profile_table: {file name: temperature profile} from survey_profile_table or temperature_profile_table
+    - write_cache: Also write binary sidecars of both outputs
+
+    Returns the record of calibrate_survey.
+    """
+    return calibrate_survey(os.path.basename(file_path), lambda: read_converted_file(file_path),
+                            output_dir, output_dir2, profile_table, write_cache)
+
+
+def calibrate_survey(file_name, load, output_dir, output_dir2, profile_table, write_cache=False):
+    """
+    Apply the temperature correction to one survey and save both outputs as file_name.
+
+    load is called to get the (header_lines, data) of the survey, e.g. read_converted_file, so that
+    errors while reading are reported in the record like any other.
+
+    Returns a {"file", "status", "rows", "dropped", "elapsed", "error"} record. Status is "success",
+    "skipped" when the date or its temperatures are missing, or "error"; rows counts the corrected rows
+    written and dropped the rows removed for a non-numeric resistivity or z.
+    """
+    started = time.perf_counter()
+    result = {"file": file_name, "status": "success", "rows": 0, "dropped": 0, "elapsed": 0.0, "error": None}
+    print(f"Processing file: {file_name}")
+
+    try:
+        # Step 1-2: Read the file header and the data section
+        header_lines, data = load()
+
+        # Ensure that 'resistivity' and 'z' are numeric. Non-numeric entries will be converted to NaN.
+        data['z'] = pd.to_numeric(data['z'], errors='coerce')
+        data['resistivity'] = pd.to_numeric(data['resistivity'], errors='coerce')
+
+        # Drop rows where 'z' or 'resistivity' are NaN (invalid data)
+        rows_read = len(data)
+        data.dropna(subset=['z', 'resistivity'], inplace=True)
+        result["dropped"] = rows_read - len(data)
+
+        # Step 3: Extract the date from the filename
+        date = survey_date(file_name)
+        if date is None:
+            print(f"Date format error in file name: {file_name}")
+            return _finish(result, started, "skipped", "Date format error in file name")
+
+        # Step 4: Apply temperature correction if temperature data is available for the survey
+        if file_name not in profile_table:
+            print(f"No temperature data available for the date in {file_name}")
+            return _finish(result, started, "skipped", f"No temperature data for {date}")
+        temperatures = profile_table[file_name]
+        if temperatures is None:  # Fewer than 6 temperature columns
+            print(f"Temperature data format error for date {date}")
+            return _finish(result, started, "skipped", f"Temperature data format error for {date}")
+        print(f"Temperatures for {file_name}: {temperatures}")
+
+        # Step 5: Interpolate temperatures for each depth and apply resistivity calibration
+        apply_temperature_correction(data, temperatures)
+
+        # Step 6: Save results to the output directories
+        output_file_path = os.path.join(output_dir, file_name)
+        output_file_path2 = os.path.join(output_dir2, file_name)
 
-                # Step 4: Apply temperature correction if temperature data is available for the date
-                if date in temperature_dict:
-                    temp_data = temperature_dict[date]
-                    if temp_data.shape[1] < 7:  # Ensure there are at least 6 temperature columns
-                        print(f"Temperature data format error for date {date}")
-                        continue
-                    temperatures = temp_data.iloc[0, 1:7].values.astype(float)
-                    print(f"Temperatures for {date}: {temperatures}")
-
-                    # Step 5: Interpolate temperatures for each depth and apply resistivity calibration
-                    data['interpolated_temperature'] = data['z'].apply(
-                        lambda z: interpolate_temperature(z, depths, temperatures))
-                    data['corrected_resistivity'] = data.apply(
-                        lambda row: apply_calibration(row['resistivity'], row['interpolated_temperature']), axis=1)
-
-                    # Step 6: Save results to the output directories
-                    output_file_path = os.path.join(output_dir, file_name)
-                    output_file_path2 = os.path.join(output_dir2, file_name)
-
-                    # Detailed output file (includes interpolated temperature and corrected resistivity)
-                    with open(output_file_path, 'w', newline='') as f:
-                        f.writelines(header_lines)
-                        f.write(
-                            "# a    b   m   n   resistivity   x   z   interpolated_temperature   corrected_resistivity\n")
-                        data.to_csv(f, sep='\t', index=False, header=False, float_format='%g')
-
-                    # Simplified output file (only includes corrected resistivity)
-                    with open(output_file_path2, 'w') as f:
-                        f.writelines(header_lines)
-                        f.write("# a    b    m    n    rhoa\n")
-                        for _, row in data.iterrows():
-                            f.write(
-                                f"{int(row['a']):>6}\t{int(row['b']):>6}\t{int(row['m']):>6}\t{int(row['n']):>6}\t{row['corrected_resistivity']:>15.2f}\n")
-
-                    print(f"Processed and saved: {output_file_path}")
-                    print(f"Processed and saved: {output_file_path2}")
-                else:
-                    print(f"No temperature data available for the date in {file_name}")
-
-            except FileNotFoundError:
-                print(f"Data file {file_name} not found")
-            except Exception as e:
-                print(f"Error loading {file_name}: {e}")
+        # Detailed output file (includes interpolated temperature and corrected resistivity)
+        with open(output_file_path, 'w', newline='') as f:
+            f.writelines(header_lines)
+            f.write(
+                "# a    b   m   n   resistivity   x   z   interpolated_temperature   corrected_resistivity\n")
+            data.to_csv(f, sep='\t', index=False, header=False, float_format='%g')
+
+        # Simplified output file (only includes corrected resistivity)
+        write_simplified_output(output_file_path2, header_lines, data)
+
+        if write_cache:
+            write_cached_outputs(output_file_path, output_file_path2, header_lines, data)
+
+        print(f"Processed and saved: {output_file_path}")
+        print(f"Processed and saved: {output_file_path2}")
+        result["rows"] = len(data)
+        return _finish(result, started, "success")
+
+    except FileNotFoundError:
+        print(f"Data file {file_name} not found")
+        return _finish(result, started, "error", "Data file not found")
+    except Exception as e:
+        print(f"Error loading {file_name}: {e}")
+        return _finish(result, started, "error", str(e))
+
+
+def _finish(result, started, status, error=None):
+    result.update(status=status, error=error, elapsed=round(time.perf_counter() - started, 4))
+    return result
+
+
+_worker_profile_table = None
+
+
+def _init_worker(profile_table):
+    """Pool initializer: each worker receives the profile table once instead of once per file."""
+    global _worker_profile_table
+    _worker_profile_table = profile_table
+
+
+def _calibrate_file_in_worker(file_path, output_dir, output_dir2, write_cache):
+    return calibrate_file(file_path, output_dir, output_dir2, _worker_profile_table, write_cache)
+
+
+def process_files(data_dir, output_dir, output_dir2, temperature_dict, write_cache=False, workers=1,
+                  max_gap=MAX_TEMPERATURE_GAP):
+    """
+    Process files in the input directory, apply temperature correction, and save the results.
+
+    Args:
+    - data_dir: Directory containing input .txt files
+    - output_dir: Directory for detailed output files
+    - output_dir2: Directory for simplified output files
+    - temperature_dict: TemperatureStore of the temperature log, matched to each survey's time of day
+      (see survey_profile_table), or a dict from load_temperature_data, whose first reading of the
+      survey date is used
+    - write_cache: Also write binary sidecars of both outputs
+    - workers: Number of worker processes, 1 processes serially and None uses every core
+    - max_gap: Longest logger gap survey temperatures are interpolated across, see survey_profile_table
+
+    The data section is taken from an up-to-date binary sidecar of the input when there is one.
+    Returns one calibrate_file record per .txt file, in filename order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(output_dir2, exist_ok=True)
 
+    file_names = sorted(file_name for file_name in os.listdir(data_dir) if file_name.endswith(".txt"))
+    file_paths = [os.path.join(data_dir, file_name) for file_name in file_names]
+    if isinstance(temperature_dict, TemperatureStore):
+        profile_table = survey_profile_table(temperature_dict, file_names, max_gap)
+    else:
+        profile_table = temperature_profile_table(temperature_dict, file_names)
 
+    if workers == 1 or len(file_paths) < 2:
+        return [calibrate_file(file_path, output_dir, output_dir2, profile_table, write_cache)
+                for file_path in file_paths]
 
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile_table,)) as executor:
+        return list(executor.map(_calibrate_file_in_worker,
+                                 file_paths,
+                                 [output_dir] * len(file_paths),
+                                 [output_dir2] * len(file_paths),
+                                 [write_cache] * len(file_paths),
+                                 chunksize=max(1, len(file_paths) // (4 * (workers or os.cpu_count() or 1)))))
@@ -0,0 +1,88 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.resistivity_temperature_correction import (DEPTHS, apply_calibration, apply_temperature_correction,
+                                                    format_simplified_rows, interpolate_temperature, read_converted_file,
+                                                    survey_profile_table)
+from lib.temperature_store import TemperatureStore
+
+
+def test_vectorized_correction_matches_row_by_row():
+    temperatures = np.array([11.5, 12.0, 12.5, np.nan, 15.5, 17.0])
+    data = pd.DataFrame({
+        'resistivity': [893.76, 936.362, 100.0, 250.0, 400.0, 512.5],
+        'z': [-6.0, -4.0, -3.2, -1.2, -2.0, 0.3],
+    })
+    apply_temperature_correction(data, temperatures)
+
+    for row in data.itertuples():
+        expected_temperature = interpolate_temperature(row.z, DEPTHS, temperatures)
+        expected = apply_calibration(row.resistivity, expected_temperature)
+        np.testing.assert_equal(row.interpolated_temperature, expected_temperature)
+        np.testing.assert_equal(row.corrected_resistivity, np.nan if expected is None else expected)
+    # Depths next to the missing -1.5 m reading have no temperature, the ends are clamped
+    assert np.isnan(data['corrected_resistivity'][3]) and np.isnan(data['corrected_resistivity'][4])
+    assert data['interpolated_temperature'][0] == 11.5 and data['interpolated_temperature'][5] == 17.0
+
+
+def test_simplified_rows_keep_the_row_by_row_layout():
+    data = pd.DataFrame({
+        'a': [1, 12, 123456], 'b': [2, 13, 7], 'm': [3, 14, 8], 'n': [4, 15, 9],
+        'corrected_resistivity': [893.755, -0.001, np.nan],
+    })
+    expected = ''.join(
+        f"{int(row['a']):>6}\t{int(row['b']):>6}\t{int(row['m']):>6}\t{int(row['n']):>6}\t{row['corrected_resistivity']:>15.2f}\n"
+        for _, row in data.iterrows())
+    assert format_simplified_rows(data) == expected
+
+
+def test_survey_profiles_follow_the_time_of_day(capsys):
+    times = np.array(['2022-07-03T09:00', '2022-07-03T15:00', '2022-07-03T15:30'], dtype='datetime64[ns]')
+    temperatures = np.repeat([[10.0], [16.0], [17.0]], 6, axis=1)
+    store = TemperatureStore(times.view(np.int64), temperatures, [str(depth) for depth in DEPTHS])
+    file_names = ["2022-07-03_15-15-00.txt", "2022-07-03_line1.txt", "2022-07-03_04-00-00.txt",
+                  "2022-07-04_06-00-00.txt", "2022-07-05_15-15-00.txt", "2022-07-05_line1.txt", "survey.txt"]
+
+    table = survey_profile_table(store, file_names)
+    assert sorted(table) == ["2022-07-03_04-00-00.txt", "2022-07-03_15-15-00.txt", "2022-07-03_line1.txt",
+                             "2022-07-04_06-00-00.txt"]
+    np.testing.assert_array_equal(table["2022-07-03_15-15-00.txt"], np.full(6, 16.5))
+    # Surveys named by date only keep the first reading of the day
+    np.testing.assert_array_equal(table["2022-07-03_line1.txt"], np.full(6, 10.0))
+    # Surveys beyond max_gap of any reading fall back to the nearest one within a day, with a warning
+    np.testing.assert_array_equal(table["2022-07-03_04-00-00.txt"], np.full(6, 10.0))
+    np.testing.assert_array_equal(table["2022-07-04_06-00-00.txt"], np.full(6, 17.0))
+    warnings = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Warning")]
+    assert len(warnings) == 2 and "2022-07-03_04-00-00.txt" in warnings[0]
+
+    # A wider max_gap interpolates across the gap between 09:00 and 15:00
+    table = survey_profile_table(store, ["2022-07-03_12-00-00.txt"], max_gap=pd.Timedelta(hours=6))
+    np.testing.assert_array_equal(table["2022-07-03_12-00-00.txt"], np.full(6, 13.0))
+
+
+def test_read_converted_file_typed_and_general_paths():
+    header = ["48# Number of electrodes\n", "# x z\n"] + [f"{i}.000     0.000\n" for i in range(48)]
+    header.append("2# Number of data\n")
+    text = ''.join(header) + "# a b m n rhoa x z\n1 2 3 4 893.76 1.5 -0.75\n5 6 7 8 936.362 5.5 -0.75\n"
+
+    header_lines, data = read_converted_file(io.StringIO(text))
+    assert header_lines == header
+    assert data.dtypes.tolist() == [np.int64] * 4 + [np.float64] * 3
+    assert data['resistivity'].tolist() == [893.76, 936.362]
+
+    # Irregular spacing and non-numeric entries go through the general whitespace parse
+    _, data = read_converted_file(io.StringIO(text.replace("5 6 7 8 936.362", "5  6 7 8 bad")))
+    assert data['a'].tolist() == [1, 5] and data['resistivity'].tolist() == ['893.76', 'bad']
+
+
+def test_read_converted_file_rejects_a_shifted_header():
+    # With 47 electrodes line 52 is the first measurement, which must not be skipped
+    header = ["47# Number of electrodes\n", "# x z\n"] + [f"{i}.000     0.000\n" for i in range(47)]
+    header += ["2# Number of data\n", "# a b m n rhoa x z\n"]
+    text = ''.join(header) + "1 2 3 4 893.76 1.5 -0.75\n5 6 7 8 936.362 5.5 -0.75\n"
+
+    with pytest.raises(ValueError, match="Line 52"):
+        read_converted_file(io.StringIO(text))
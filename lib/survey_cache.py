@@ -0,0 +1,135 @@
+"""
+Binary columnar sidecar for the whitespace-delimited survey files.
+
+A sidecar sits next to its text file as "<name>.txt.bin" and holds the same columns as raw arrays:
+
+    8 bytes  magic b'SCMCOLS1'
+    4 bytes  little-endian length of the JSON header
+    JSON     {"source_size": ..., "columns": {name: {"dtype", "shape", "offset"}}, "meta": {...}}
+    data     each column as raw bytes, aligned to 64 bytes
+
+Loading maps the file once and returns read-only array views into that mapping, so reading a converted
+survey costs one mmap instead of a CSV parse. A sidecar is only used while it is at least as new as its
+text file and the text file still has the size it was written for.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+CACHE_SUFFIX = '.bin'
+MAGIC = b'SCMCOLS1'
+ALIGNMENT = 64
+
+
+def cache_path(text_path):
+    return os.fspath(text_path) + CACHE_SUFFIX
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_survey_cache(text_path, columns, meta=None):
+    """
+    Write the sidecar of text_path. Call it after the text file is written so the sidecar is newer.
+
+    Args:
+    - text_path: The text file the columns were written to
+    - columns: Mapping of column name to numpy array (numeric dtypes only)
+    - meta: Optional JSON-serialisable dict stored with the columns
+    """
+    arrays = {name: np.ascontiguousarray(values) for name, values in columns.items()}
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        layout[name] = {'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': offset}
+        offset = _align(offset + values.nbytes)
+
+    header = json.dumps({
+        'source_size': os.path.getsize(text_path),
+        'columns': layout,
+        'meta': meta or {},
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    path = cache_path(text_path)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for name, values in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+
+
+def load_survey_cache(text_path):
+    """
+    Load the sidecar of text_path.
+
+    Returns (columns, meta), where columns maps names to read-only arrays backed by one memory map,
+    or None if there is no sidecar or it is older than, or does not match, the text file.
+    """
+    path = cache_path(text_path)
+    try:
+        cache_stat = os.stat(path)
+        text_stat = os.stat(text_path)
+    except OSError:
+        return None
+    if cache_stat.st_mtime_ns < text_stat.st_mtime_ns:
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        if header['source_size'] != text_stat.st_size:
+            return None
+
+        data_start = _align(len(MAGIC) + 4 + header_length)
+        mapped = np.memmap(path, dtype=np.uint8, mode='r')
+        columns = {}
+        for name, spec in header['columns'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            start = data_start + spec['offset']
+            columns[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        return columns, header['meta']
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"Ignoring unreadable cache {path}: {e}")
+        return None
+
+
+def numeric_column(values):
+    """
+    Convert a column of numeric text to int64 when every value is an integer, float64 otherwise,
+    the same inference pandas applies when it reads the text file.
+    """
+    values = np.asarray(values)
+    try:
+        return values.astype(np.int64)
+    except ValueError:
+        return values.astype(np.float64)
+
+
+def parse_electrode_positions(electrode_lines):
+    """Converts "x     z" electrode lines into an (n, 2) float array."""
+    if len(electrode_lines) == 0:
+        return np.empty((0, 2))
+    return np.array([line.split() for line in electrode_lines], dtype=float).reshape(-1, 2)
+
+
+def electrodes_from_header(header_lines):
+    """Electrode positions from the "<n># Number of electrodes" / "# x z" block at the top of a survey file."""
+    electrode_count = int(header_lines[0].split('#')[0])
+    electrode_lines = header_lines[2:2 + electrode_count]
+    if len(electrode_lines) != electrode_count:
+        raise ValueError(f"Header lists {electrode_count} electrodes but only {len(electrode_lines)} were read")
+    return parse_electrode_positions(electrode_lines)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from lib.survey_cache import cache_path, load_survey_cache, numeric_column, write_survey_cache
+
+
+def test_survey_cache_round_trip(tmp_path):
+    text_path = tmp_path / "2022-07-03_09-00-00.txt"
+    text_path.write_text("converted survey\n")
+    columns = {
+        'electrodes': np.arange(8, dtype=float).reshape(4, 2),
+        'a': np.array([1, 2, 3], dtype=np.int64),
+        'rho': np.array([893.76, 936.362, np.nan]),
+        'empty': np.empty(0),
+    }
+    write_survey_cache(text_path, columns, meta={'source': 'test'})
+
+    loaded, meta = load_survey_cache(text_path)
+    assert meta == {'source': 'test'}
+    assert set(loaded) == set(columns)
+    for name, values in columns.items():
+        assert loaded[name].dtype == values.dtype
+        np.testing.assert_array_equal(loaded[name], values)
+
+
+def test_survey_cache_ignored_when_text_changes(tmp_path):
+    text_path = tmp_path / "survey.txt"
+    text_path.write_text("converted survey\n")
+    write_survey_cache(text_path, {'a': np.array([1, 2])})
+
+    # Same size but newer text file
+    stat = os.stat(cache_path(text_path))
+    os.utime(text_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_survey_cache(text_path) is None
+
+    # Fresh cache of a text file that was rewritten with different content
+    write_survey_cache(text_path, {'a': np.array([1, 2])})
+    text_path.write_text("converted survey, edited\n")
+    os.utime(cache_path(text_path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert load_survey_cache(text_path) is None
+
+    assert load_survey_cache(tmp_path / "missing.txt") is None
+
+
+def test_numeric_column_matches_pandas_inference():
+    assert numeric_column(np.array(["1", "-2", "30"])).dtype == np.int64
+    assert numeric_column(np.array(["1", "-2.5"])).dtype == np.float64
@@ -1,10 +1,12 @@
+import os
 import re
-import pandas as pd
 from datetime import datetime
 import matplotlib.pyplot as plt
-import numpy as np
 import io
 import base64
+
+from lib.compressed_io import has_extension
+from lib.temperature_store import TemperatureStore
 ##########################################
 ##  INPUT Parameter:
 ##  txo_file = '2021-11-12_03-30-00.tx0'
@@ -59,29 +61,59 @@ def extract_temperature_data(file_path, target_date, target_time):
     Extract temperature data from GNtemp.txt file for the closest time to the specified date and time.
 
     Parameters:
-    file_path (str): Path to the GNtemp.txt file
+    file_path (str): Path to the GNtemp.txt file, optionally gzip/xz/bzip2 compressed
     target_date (str): Target date in 'YYYY-MM-DD' format
     target_time (str): Target time in 'HH:MM:SS' format
 
     Returns:
     dict: Dictionary containing temperature data for different depths
     """
-    df = pd.read_csv(file_path, sep='\t')
-    print("Columns in the file:", df.columns.tolist())
-    
-    datetime_col = df.columns[0]
-    df['datetime'] = pd.to_datetime(df[datetime_col], format='%d/%m/%Y %I:%M:%S %p', errors='coerce')
+    store = TemperatureStore.from_file(file_path)
+    print("Columns in the file:", ['time'] + store.columns)
     
     target_datetime = f"{target_date} {target_time}"
     target_dt = datetime.strptime(target_datetime, '%Y-%m-%d %H:%M:%S')
     
-    closest_time = df.iloc[(df['datetime'] - target_dt).abs().argsort()[:1]].index[0]
+    closest_time = store.nearest_index(target_dt)
     
     depth_columns = ['-4', '-3.5', '-3', '-1.5', '-1', '-0.5']
-    temp_data = df.loc[closest_time, depth_columns].to_dict()
+    temp_data = store.profile(closest_time, depth_columns)
     
     return temp_data
 
+def extract_temperature_data_batch(file_path, tx0_files):
+    """
+    Extract the temperature data closest in time to each of several tx0 files in one vectorized lookup.
+
+    Parameters:
+    file_path (str): Path to the GNtemp.txt file, optionally gzip/xz/bzip2 compressed
+    tx0_files (str or list): Folder of tx0 files, or a list of tx0 filenames
+
+    Returns:
+    dict: {tx0 filename: dictionary containing temperature data for different depths}. Files without a
+          date in their name are left out.
+    """
+    if isinstance(tx0_files, (str, os.PathLike)):
+        tx0_files = sorted(f for f in os.listdir(tx0_files) if has_extension(f, '.tx0'))
+    
+    filenames, targets = [], []
+    for filename in tx0_files:
+        datetime_result = extract_datetime_from_filename(os.path.basename(filename))
+        if datetime_result is None:
+            print(f"Error: Failed to extract date and time from filename {filename}")
+            continue
+        target_date, target_time = datetime_result
+        filenames.append(filename)
+        targets.append(f"{target_date} {target_time or '00:00:00'}")
+    if not filenames:
+        return {}
+    
+    store = TemperatureStore.from_file(file_path)
+    depth_columns = ['-4', '-3.5', '-3', '-1.5', '-1', '-0.5']
+    profiles = store.profiles(store.nearest_indices(targets), depth_columns)
+    
+    return {filename: dict(zip(depth_columns, profile)) for filename, profile in zip(filenames, profiles)}
+
 def create_temp_vs_depth_plot(temp_data):
     """
     Create a temperature vs depth plot based on the provided temperature data.
@@ -0,0 +1,18 @@
+from benchmarks import synthetic
+from lib.temp_depth_graph import extract_datetime_from_filename, extract_temperature_data, extract_temperature_data_batch
+
+
+def test_batch_lookup_matches_per_file_lookup(tmp_path):
+    synthetic.generate_temperature_log(tmp_path / "GNtemp.txt", years=0.02)
+    tx0_files = ["2021-01-02_09-00-00.tx0", "2021-01-03_09-14-59.tx0", "2021-01-03_09-15-00.tx0",
+                 "2021-01-04.tx0", "DD_2021_01_05.tx0", "survey.tx0"]
+    for filename in tx0_files:
+        (tmp_path / filename).write_text("")
+
+    batch = extract_temperature_data_batch(tmp_path / "GNtemp.txt", tmp_path)
+
+    assert sorted(batch) == sorted(tx0_files[:-1])
+    for filename in tx0_files[:-1]:
+        target_date, target_time = extract_datetime_from_filename(filename)
+        assert batch[filename] == extract_temperature_data(tmp_path / "GNtemp.txt", target_date,
+                                                           target_time or "00:00:00")
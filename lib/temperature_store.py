@@ -0,0 +1,319 @@
+"""
+Parsed, time-sorted view of a GNtemp temperature log.
+
+The log is parsed once into int64 timestamps (nanoseconds since the epoch, sorted ascending) and a float
+matrix with one column per depth. The arrays are cached in CACHE_DIR (override with the ERT_TEMPERATURE_CACHE
+environment variable), keyed by the SHA-256 of the log, so later runs and other consumers of the same log
+skip the text parse entirely.
+"""
+
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import date as Date
+
+import numpy as np
+import pandas as pd
+
+from lib.compressed_io import open_text
+from lib.conversion_manifest import file_sha256
+from lib.disk_cache import CACHE_ROOT, DiskCache, cache_key
+
+STORE_VERSION = 2
+CACHE_DIR = os.environ.get('ERT_TEMPERATURE_CACHE', os.path.join(CACHE_ROOT, 'temperature_logs'))
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MAX_LOADED_STORES = 8
+GNTEMP_TIME_FORMAT = '%d/%m/%Y %I:%M:%S %p'
+INTEGER_PATTERN = r'\s*[+-]?\d+\s*'
+NS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+
+# Stores loaded in this process, least recently used first
+_loaded_stores = OrderedDict()
+
+
+def store_key(digest):
+    """Cache key of the store of a log with SHA-256 digest."""
+    return cache_key(version=STORE_VERSION, sha256=digest)
+
+
+def parse_times(values):
+    """
+    Parse the time column of a temperature log.
+
+    The GNtemp logger format is tried first, then ISO timestamps as written by filter_temperature_data,
+    and only then pandas' general day-first parsing. Unparseable entries become NaT.
+    """
+    values = pd.Series(values, dtype=str)
+    present = values.notna() & (values.str.strip() != '')
+    for time_format in (GNTEMP_TIME_FORMAT, 'ISO8601'):
+        times = pd.to_datetime(values, format=time_format, errors='coerce')
+        if not (times.isna() & present).any():
+            return times
+    return pd.to_datetime(values, dayfirst=True, format='mixed', errors='coerce')
+
+
+def to_nanoseconds(times):
+    """int64 nanoseconds since the epoch of a list of times; int64 arrays are taken as nanoseconds already."""
+    if isinstance(times, np.ndarray) and times.dtype == np.int64:
+        return times
+    return pd.to_datetime(pd.Series(times, dtype=object)).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+class TemperatureStore:
+    def __init__(self, timestamps, temperatures, columns, source=None, integer_columns=None):
+        """
+        Args:
+        - timestamps: int64 nanoseconds since the epoch, sorted ascending
+        - temperatures: float array of shape (len(timestamps), len(columns))
+        - columns: Depth column names as they appear in the log header, e.g. '-4'
+        - source: Path of the parsed log, for messages only
+        - integer_columns: Which columns hold only integers in the log, so to_frame gives them the integer
+          dtype pandas reads them with; none by default
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.temperatures = np.asarray(temperatures, dtype=float).reshape(len(self.timestamps), len(columns))
+        self.columns = [str(column) for column in columns]
+        self.source = source
+        self.integer_columns = (np.zeros(len(self.columns), dtype=bool) if integer_columns is None
+                                else np.asarray(integer_columns, dtype=bool))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def times(self):
+        return self.timestamps.view('datetime64[ns]')
+
+    @property
+    def day_numbers(self):
+        """Days since the epoch of every reading."""
+        return self.timestamps // NS_PER_DAY
+
+    @classmethod
+    def parse(cls, temperature_file):
+        """Parse a tab separated log with a time column followed by one column per depth."""
+        with open_text(temperature_file) as f:
+            df = pd.read_csv(f, sep='\t', dtype=str)
+        times = parse_times(df.iloc[:, 0])
+        valid = times.notna().to_numpy()
+        if not valid.all():
+            print(f"Warning: {int((~valid).sum())} rows of {temperature_file} have an unreadable time and are ignored.")
+
+        columns = list(df.columns[1:])
+        values = df.iloc[:, 1:]
+        temperatures = values.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)[valid]
+        # Columns pandas would read as integers, i.e. integer literals only and nothing missing
+        integer_columns = [values[column].str.fullmatch(INTEGER_PATTERN, na=False).all() for column in columns]
+        timestamps = times[valid].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        return cls(timestamps[order], temperatures[order], columns, source=temperature_file,
+                   integer_columns=integer_columns)
+
+    @classmethod
+    def from_file(cls, temperature_file, use_cache=True, cache_dir=None):
+        """
+        Load the store of a log, from the binary cache when a log with the same content was parsed before.
+
+        A missing cache entry is rebuilt; failing to write it (e.g. read-only folder) is not an error.
+        The last MAX_LOADED_STORES stores are shared within a process, so they must not be modified in place.
+
+        Args:
+        - temperature_file: GNtemp log, optionally compressed
+        - use_cache: False parses the log without touching either cache
+        - cache_dir: Cache folder, CACHE_DIR by default
+        """
+        if not use_cache:
+            return cls.parse(temperature_file)
+
+        # Repeated lookups in one process reuse the loaded store until the log changes on disk
+        stat = os.stat(temperature_file)
+        key = (os.path.abspath(temperature_file), stat.st_size, stat.st_mtime_ns)
+        if key in _loaded_stores:
+            _loaded_stores.move_to_end(key)
+            return _loaded_stores[key]
+
+        digest = file_sha256(temperature_file)
+        store = cls.load_cache(temperature_file, digest, cache_dir)
+        if store is None:
+            store = cls.parse(temperature_file)
+            store.save_cache(digest, cache_dir)
+        _loaded_stores[key] = store
+        while len(_loaded_stores) > MAX_LOADED_STORES:
+            _loaded_stores.popitem(last=False)
+        return store
+
+    @classmethod
+    def load_cache(cls, temperature_file, digest, cache_dir=None):
+        """The cached store of a log with SHA-256 digest, or None."""
+        path = DiskCache(cache_dir or CACHE_DIR, 'npz').get(store_key(digest))
+        if path is None:
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as cache:
+                return cls(cache['timestamps'], cache['temperatures'], cache['columns'].tolist(),
+                           source=temperature_file, integer_columns=cache['integer_columns'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable temperature cache {path}: {e}")
+            return None
+
+    def save_cache(self, digest, cache_dir=None):
+        """Cache the store as the store of a log with SHA-256 digest, see load_cache."""
+        cache = DiskCache(cache_dir or CACHE_DIR, 'npz', MAX_CACHE_BYTES)
+        try:
+            cache.put(store_key(digest), lambda temp_path: np.savez(
+                temp_path, timestamps=self.timestamps, temperatures=self.temperatures,
+                columns=np.array(self.columns), integer_columns=self.integer_columns))
+        except OSError as e:
+            print(f"Could not write temperature cache in {cache.directory}: {e}")
+
+    def select(self, mask):
+        """A new store with the readings where mask is True."""
+        return TemperatureStore(self.timestamps[mask], self.temperatures[mask], self.columns, source=self.source,
+                                integer_columns=self.integer_columns)
+
+    def select_days(self, dates):
+        """A new store with the readings logged on any of dates ('YYYY-MM-DD' strings or datetime.date)."""
+        days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+        return self.select(np.isin(self.day_numbers, days))
+
+    def nearest_indices(self, targets):
+        """
+        Indices of the readings closest in time to each target, by binary search; ties go to the earlier reading.
+
+        Args:
+        - targets: Anything pd.to_datetime accepts as a list of times, e.g. datetimes or 'YYYY-MM-DD HH:MM:SS'
+        """
+        if not len(self):
+            raise ValueError(f"No temperature readings in {self.source}")
+        targets = to_nanoseconds(targets)
+        if len(self) == 1:
+            return np.zeros(len(targets), dtype=np.intp)
+        upper = np.searchsorted(self.timestamps, targets, side='left').clip(1, len(self) - 1)
+        lower = upper - 1
+        closer_to_upper = self.timestamps[upper] - targets < targets - self.timestamps[lower]
+        return np.where(closer_to_upper, upper, lower)
+
+    def nearest_index(self, target):
+        """Index of the reading closest in time to target; ties go to the earlier reading."""
+        return int(self.nearest_indices([target])[0])
+
+    def bracketing_indices(self, targets):
+        """
+        (lower, upper) indices of the readings at or just before and at or just after each target.
+
+        Both are the same index when a reading matches the target exactly, and targets outside the log
+        are clamped to its first or last reading.
+        """
+        if not len(self):
+            raise ValueError(f"No temperature readings in {self.source}")
+        targets = to_nanoseconds(targets)
+        upper = np.searchsorted(self.timestamps, targets, side='left')
+        exact = (upper < len(self)) & (self.timestamps[upper.clip(0, len(self) - 1)] == targets)
+        lower = np.where(exact, upper, upper - 1)
+        return lower.clip(0, len(self) - 1), upper.clip(0, len(self) - 1)
+
+    def interpolate(self, targets, max_gap=None):
+        """
+        Temperatures at each target time, linearly interpolated between the two bracketing readings.
+
+        Args:
+        - targets: Target times, see nearest_indices
+        - max_gap: Optional pd.Timedelta. Readings further apart than this are not interpolated between;
+          the nearer one is used alone, and targets without a reading within max_gap are not found.
+
+        Returns (temperatures, found): a (len(targets), len(columns)) array, NaN where not found, and a
+        boolean array. Targets outside the log are only found within max_gap of its first or last reading.
+        """
+        targets = to_nanoseconds(targets)
+        lower, upper = self.bracketing_indices(targets)
+        lower_time, upper_time = self.timestamps[lower], self.timestamps[upper]
+        span = upper_time - lower_time
+        inside = (lower_time <= targets) & (targets <= upper_time)
+
+        weight = np.zeros(len(targets))
+        np.divide(targets - lower_time, span, out=weight, where=inside & (span > 0))
+        weight = weight[:, None]
+        interpolated = self.temperatures[lower] + weight * (self.temperatures[upper] - self.temperatures[lower])
+        # An exact match must not pick up a NaN from the other reading
+        interpolated = np.where(weight == 0, self.temperatures[lower], interpolated)
+
+        if max_gap is None:
+            return interpolated, np.ones(len(targets), dtype=bool)
+
+        max_gap = pd.Timedelta(max_gap).value
+        bracketed = inside & (span <= max_gap)
+        lower_distance, upper_distance = np.abs(targets - lower_time), np.abs(upper_time - targets)
+        nearest = np.where(upper_distance < lower_distance, upper, lower)
+        found = bracketed | (np.minimum(lower_distance, upper_distance) <= max_gap)
+
+        temperatures = np.where(bracketed[:, None], interpolated, self.temperatures[nearest])
+        temperatures[~found] = np.nan
+        return temperatures, found
+
+    def profiles(self, indices, columns=None):
+        """Temperatures of several readings as a (len(indices), len(columns)) array."""
+        columns = self.columns if columns is None else columns
+        return self.temperatures[np.asarray(indices)][:, [self.columns.index(column) for column in columns]]
+
+    def profile(self, index, columns=None):
+        """Temperatures of one reading as {depth column: value}."""
+        columns = self.columns if columns is None else columns
+        return {column: self.temperatures[index, self.columns.index(column)] for column in columns}
+
+    def to_frame(self):
+        """The readings as a DataFrame with a datetime 'time' column followed by the depth columns."""
+        frame = pd.DataFrame(self.temperatures.copy(), columns=self.columns)
+        for column in np.array(self.columns)[self.integer_columns]:
+            frame[column] = frame[column].astype(np.int64)
+        frame.insert(0, 'time', self.times)
+        return frame
+
+
+class DailyTemperatureTable(Mapping):
+    """
+    Read-only {datetime.date: readings of that day} mapping over a TemperatureStore.
+
+    The readings stay in the store's single contiguous array, indexed by the first row of each day;
+    a day's DataFrame (time, depth columns, date) is only built when it is looked up.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.days, self.offsets = np.unique(store.day_numbers, return_index=True)
+        self.ends = np.append(self.offsets[1:], len(store))
+
+    def _row_range(self, key):
+        if not isinstance(key, Date):
+            return None
+        day = np.datetime64(key, 'D').astype(np.int64)
+        position = np.searchsorted(self.days, day)
+        if position == len(self.days) or self.days[position] != day:
+            return None
+        return self.offsets[position], self.ends[position]
+
+    def __getitem__(self, key):
+        row_range = self._row_range(key)
+        if row_range is None:
+            raise KeyError(key)
+        frame = self.store.select(slice(*row_range)).to_frame()
+        frame['date'] = key
+        return frame
+
+    def __contains__(self, key):
+        return self._row_range(key) is not None
+
+    def __iter__(self):
+        return iter(self.days.astype('datetime64[D]').astype(object))
+
+    def __len__(self):
+        return len(self.days)
+
+    def first_profile(self, key, count=6):
+        """
+        The first `count` temperatures of the first reading of a day, None if the day is missing or the log
+        has fewer than `count` temperature columns.
+        """
+        row_range = self._row_range(key)
+        if row_range is None or len(self.store.columns) < count:
+            return None
+        return self.store.temperatures[row_range[0], :count]
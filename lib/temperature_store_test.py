@@ -0,0 +1,139 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from lib import temperature_store
+from lib.data_filter import filter_temperature_data
+from lib.temperature_store import DailyTemperatureTable, TemperatureStore
+
+GNTEMP_LOG = (
+    "time\t-4\t-3.5\t-3\t-1.5\t-1\t-0.5\n"
+    "03/07/2022 10:30:00 AM\t11.5\t12.0\t12.5\t14.0\t15.5\t17.0\n"
+    "03/07/2022 09:00:00 AM\t11.4\t11.9\t12.4\t13.9\t15.4\t16.9\n"
+    "04/07/2022 01:00:00 PM\t11.6\t12.1\t12.6\t14.1\tbad\t17.1\n"
+)
+
+
+def test_store_parses_sorts_and_caches(tmp_path):
+    log = tmp_path / "GNtemp.txt"
+    log.write_text(GNTEMP_LOG)
+    cache_dir = tmp_path / "cache"
+
+    store = TemperatureStore.from_file(log, cache_dir=cache_dir)
+    # The cache lives in the cache folder, not next to the log
+    assert sorted(os.listdir(tmp_path)) == ["GNtemp.txt", "cache"]
+    assert len(os.listdir(cache_dir)) == 1
+    assert store.columns == ['-4', '-3.5', '-3', '-1.5', '-1', '-0.5']
+    np.testing.assert_array_equal(store.times, np.array(['2022-07-03T09:00', '2022-07-03T10:30', '2022-07-04T13:00'],
+                                                        dtype='datetime64[ns]'))
+    assert np.isnan(store.temperatures[2, 4])
+
+    cached = TemperatureStore.load_cache(log, temperature_store.file_sha256(log), cache_dir)
+    np.testing.assert_array_equal(cached.timestamps, store.timestamps)
+    np.testing.assert_array_equal(cached.temperatures, store.temperatures)
+
+    # A changed log gets its own entry
+    log.write_text(GNTEMP_LOG.replace("11.5", "99.0"))
+    assert TemperatureStore.from_file(log, cache_dir=cache_dir).temperatures[1, 0] == 99.0
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_loaded_stores_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(temperature_store, "_loaded_stores", temperature_store.OrderedDict())
+    monkeypatch.setattr(temperature_store, "MAX_LOADED_STORES", 2)
+    logs = []
+    for i in range(3):
+        logs.append(tmp_path / f"GNtemp{i}.txt")
+        logs[-1].write_text(GNTEMP_LOG)
+    first = TemperatureStore.from_file(logs[0], cache_dir=tmp_path / "cache")
+    for log in logs:
+        TemperatureStore.from_file(log, cache_dir=tmp_path / "cache")
+
+    assert len(temperature_store._loaded_stores) == 2
+    assert TemperatureStore.from_file(logs[0], cache_dir=tmp_path / "cache") is not first
+
+
+def test_filtered_log_keeps_integer_columns(tmp_path):
+    log = tmp_path / "GNtemp.txt"
+    log.write_text(GNTEMP_LOG.replace("\t12.0\t", "\t12\t").replace("\t12.1\t", "\t12\t")
+                   .replace("\t11.9\t", "\t11\t").replace("\t12.5\t", "\t12.75\t").replace("bad", "15.6"))
+    filter_temperature_data(log, ['2022-07-03', '2022-07-04'], tmp_path / "filtered.txt")
+
+    # Same as filtering the frame pandas reads the log into
+    expected = pd.read_csv(log, sep="\t", parse_dates=['time'], dayfirst=True).sort_values('time', kind='stable')
+    expected['date'] = expected['time'].dt.strftime('%Y-%m-%d')
+    expected.to_csv(tmp_path / "expected.txt", sep="\t", index=False)
+    assert (tmp_path / "filtered.txt").read_text().splitlines()[1].split("\t")[2] == "11"
+    assert (tmp_path / "filtered.txt").read_text() == (tmp_path / "expected.txt").read_text()
+
+
+def test_nearest_profile_and_filtered_log(tmp_path):
+    log = tmp_path / "GNtemp.txt"
+    log.write_text(GNTEMP_LOG)
+    store = TemperatureStore.from_file(log, use_cache=False)
+    assert store.profile(store.nearest_index('2022-07-03 10:00:00'), ['-4', '-0.5']) == {'-4': 11.5, '-0.5': 17.0}
+
+    filtered = tmp_path / "filtered.txt"
+    filter_temperature_data(log, ['2022-07-04'], filtered)
+    assert filtered.read_text().splitlines() == [
+        "time\t-4\t-3.5\t-3\t-1.5\t-1\t-0.5\tdate",
+        "2022-07-04 13:00:00\t11.6\t12.1\t12.6\t14.1\t\t17.1\t2022-07-04",
+    ]
+    # The filtered log is written in ISO format and reads back through the same store
+    assert len(TemperatureStore.from_file(filtered, use_cache=False)) == 1
+
+
+def test_nearest_and_bracketing_lookups():
+    times = np.array(['2022-07-03T09:00', '2022-07-03T09:30', '2022-07-03T10:00'], dtype='datetime64[ns]')
+    store = TemperatureStore(times.view(np.int64), np.arange(18.0).reshape(3, 6), ['-4', '-3.5', '-3', '-1.5', '-1', '-0.5'])
+    targets = ['2022-07-03 08:00', '2022-07-03 09:15', '2022-07-03 09:16', '2022-07-03 09:30', '2022-07-04 00:00']
+
+    np.testing.assert_array_equal(store.nearest_indices(targets), [0, 0, 1, 1, 2])
+    lower, upper = store.bracketing_indices(targets)
+    np.testing.assert_array_equal(lower, [0, 0, 0, 1, 2])
+    np.testing.assert_array_equal(upper, [0, 1, 1, 1, 2])
+    np.testing.assert_array_equal(store.profiles([2, 0], ['-0.5', '-4']), [[17.0, 12.0], [5.0, 0.0]])
+
+
+def test_chunked_filter_matches_in_memory_filter(tmp_path):
+    log = tmp_path / "GNtemp.txt"
+    log.write_text(GNTEMP_LOG.replace("03/07/2022 10:30:00 AM", "02/07/2022 10:30:00 AM"))
+    filter_temperature_data(log, ['2022-07-03', '2022-07-04'], tmp_path / "whole.txt")
+    filter_temperature_data(log, ['2022-07-03', '2022-07-04'], tmp_path / "chunked.txt", chunksize=1)
+    assert (tmp_path / "chunked.txt").read_text() == (tmp_path / "whole.txt").read_text()
+
+
+def test_interpolate_between_bracketing_readings():
+    times = np.array(['2022-07-03T09:00', '2022-07-03T09:30', '2022-07-03T15:00'], dtype='datetime64[ns]')
+    temperatures = np.array([[10.0, 20.0], [11.0, np.nan], [14.0, 23.0]])
+    store = TemperatureStore(times.view(np.int64), temperatures, ['-4', '-0.5'])
+    targets = ['2022-07-03 09:15', '2022-07-03 09:00', '2022-07-03 09:40', '2022-07-03 12:00', '2022-07-03 08:00',
+               '2022-07-04 09:00']
+
+    interpolated, found = store.interpolate(targets, max_gap='2h')
+    np.testing.assert_array_equal(found, [True, True, True, False, True, False])
+    np.testing.assert_array_equal(interpolated[:2], [[10.5, np.nan], [10.0, 20.0]])
+    # Readings 5.5 h apart are not interpolated between, the nearer one is used within the gap
+    np.testing.assert_array_equal(interpolated[2], [11.0, np.nan])
+    np.testing.assert_array_equal(interpolated[4], [10.0, 20.0])
+    assert np.isnan(interpolated[3]).all() and np.isnan(interpolated[5]).all()
+
+    interpolated, found = store.interpolate(['2022-07-03 12:15'])
+    assert found.all()
+    np.testing.assert_allclose(interpolated, [[12.5, np.nan]])
+
+
+def test_daily_table_is_a_mapping_of_days(tmp_path):
+    log = tmp_path / "GNtemp.txt"
+    log.write_text(GNTEMP_LOG)
+    table = DailyTemperatureTable(TemperatureStore.from_file(log, use_cache=False))
+
+    assert list(table) == [date(2022, 7, 3), date(2022, 7, 4)] and len(table) == 2
+    assert date(2022, 7, 5) not in table and table.get(date(2022, 7, 5)) is None
+    np.testing.assert_array_equal(table.first_profile(date(2022, 7, 3)), [11.4, 11.9, 12.4, 13.9, 15.4, 16.9])
+
+    day = table[date(2022, 7, 3)]
+    assert list(day.columns) == ['time', '-4', '-3.5', '-3', '-1.5', '-1', '-0.5', 'date']
+    assert len(day) == 2 and (day['date'] == date(2022, 7, 3)).all()
@@ -5,14 +5,16 @@ from PyQt5.QtWidgets import QFileDialog, QApplication, QDialogButtonBox, QStatus
 from pathlib import Path
 from PyQt5.QtGui import QPixmap
 from PyQt5 import QtCore
-from data_processor import convert_tx0_to_txt, filter_temperature_data_by_date, calibrate_resistivity
+from data_processor import process_surveys
 import tempfile
 import subprocess
 import platform
 import base64
-from DataInversion.ERT_Main import startInversion
+from DataInversion.ERT_Main import figure_paths, invert_survey
 from WaterContent.Water_Content_Main import water_computing
 from lib.temp_depth_graph import display_temp_vs_depth
+from lib.compressed_io import has_extension, open_text
+from lib.petrophysics import DEFAULT_CALIBRATION, load_model, model_key, save_model
 
 # global var
 global_tx0_input_folder = None
@@ -82,23 +84,25 @@ def open_file_browser(text_edit, tx0=True):
     options = QFileDialog.Options()
 
     if tx0:
-        files, _ = QFileDialog.getOpenFileNames(None, "Select Tx0 Files", "", "Tx0 Files (*.tx0);;All Files (*)",
+        files, _ = QFileDialog.getOpenFileNames(None, "Select Tx0 Files", "",
+                                                "Tx0 Files (*.tx0 *.tx0.gz *.tx0.xz *.tx0.bz2);;All Files (*)",
                                                 options=options)
         if files:
             global_tx0_input_folder = tempfile.mkdtemp()  # Temporary directory to store Tx0 files
             for file_path in files:
-                if os.path.isfile(file_path) and file_path.endswith('.tx0'):
+                if os.path.isfile(file_path) and has_extension(file_path, '.tx0'):
                     shutil.copy(file_path, global_tx0_input_folder)
 
             # Display Tx0 file paths in the text edit
             text_edit.clear()
             for file in files:
                 text_edit.append(file)
-                with open(file, 'r', encoding='utf-8') as f:
+                with open_text(file, encoding='utf-8') as f:
                     content = f.read()
                 text_edit.append(content)
     else:
-        file, _ = QFileDialog.getOpenFileName(None, "Select Temperature File", "", "Text Files (*.txt);;All Files (*)",
+        file, _ = QFileDialog.getOpenFileName(None, "Select Temperature File", "",
+                                              "Text Files (*.txt *.txt.gz *.txt.xz *.txt.bz2);;All Files (*)",
                                               options=options)
         if file:
             global_selected_temperature_file = file
@@ -106,7 +110,7 @@ def open_file_browser(text_edit, tx0=True):
             # Display temperature file path in the text edit
             text_edit.clear()
             text_edit.append(f"File Path: {file}\n")
-            with open(file, 'r', encoding='utf-8') as f:
+            with open_text(file, encoding='utf-8') as f:
                 content = f.read()
             text_edit.append(content)
 
@@ -152,21 +156,10 @@ def start_data_processing(ui):
     corrected_output_folder_detailed.mkdir(parents=True, exist_ok=True)
     corrected_output_folder_simplified.mkdir(parents=True, exist_ok=True)
 
-    # Set output directories for temporary files
-    txt_output_folder = Path(tempfile.mkdtemp())
-    filtered_temp_output = Path(tempfile.mkdtemp(), 'Newtem.txt')
-
-    # Step 1: Convert tx0 to txt
-    convert_tx0_to_txt(global_tx0_input_folder, txt_output_folder, converter_choice)
-    print("Conversion from tx0 to txt completed.")
-
-    # Step 2: Filter temperature data by date
-    filter_temperature_data_by_date(txt_output_folder, selected_temperature_file, filtered_temp_output)
-    print("Temperature data filtering completed.")
-
-    # Step 3: Calibrate resistivity with filtered temperature data
-    calibrate_resistivity(txt_output_folder, corrected_output_folder_detailed, corrected_output_folder_simplified,
-                          filtered_temp_output)
+    # Convert tx0 files, look up their temperatures and calibrate resistivity in one pass,
+    # writing only the corrected outputs
+    process_surveys(global_tx0_input_folder, selected_temperature_file, corrected_output_folder_detailed,
+                    corrected_output_folder_simplified, converter_choice)
     print("Resistivity calibration completed.")
 
     # Display the content of the output file in the UI text edit
@@ -222,7 +215,7 @@ def start_batch_processing(ui):
     # Step 2: Select temperature file
     print("Step 2: Select temperature file")
     selected_temperature_file, _ = QFileDialog.getOpenFileName(None, "Select Temperature File", "",
-                                                               "Text Files (*.txt);;All Files (*)")
+                                                               "Text Files (*.txt *.txt.gz *.txt.xz *.txt.bz2);;All Files (*)")
     if not selected_temperature_file:
         print("No temperature file selected. Operation cancelled.")
         return
@@ -240,10 +233,6 @@ def start_batch_processing(ui):
     os.makedirs(corrected_output_folder_detailed, exist_ok=True)
     os.makedirs(corrected_output_folder_simplified, exist_ok=True)
 
-    # Temporary output folders for txt and filtered temperature data
-    txt_output_folder = tempfile.mkdtemp()
-    filtered_temp_output = os.path.join(tempfile.mkdtemp(), 'Newtem.txt')
-
     # Step 4: Call the batch process via subprocess
     # Use the subprocess to run the data_processor functions without blocking the UI
     try:
@@ -254,17 +243,12 @@ def start_batch_processing(ui):
                 "python",  # Assuming you are using Python to run the script
                 "-c",  # Inline Python code
                 f"""
-import os
-from data_processor import convert_tx0_to_txt, filter_temperature_data_by_date, calibrate_resistivity
-
-# Convert tx0 to txt
-convert_tx0_to_txt(r'{tx0_input_folder}', r'{txt_output_folder}', '1')
-
-# Filter temperature data by date
-filter_temperature_data_by_date(r'{txt_output_folder}', r'{selected_temperature_file}', r'{filtered_temp_output}')
+from data_processor import process_surveys
 
-# Calibrate resistivity with filtered temperature data
-calibrate_resistivity(r'{txt_output_folder}', r'{corrected_output_folder_detailed}', r'{corrected_output_folder_simplified}', r'{filtered_temp_output}')
+# Convert, temperature-correct and save every new or changed tx0 file on every core, with binary sidecars
+# for the inversion to load
+process_surveys(r'{tx0_input_folder}', r'{selected_temperature_file}', r'{corrected_output_folder_detailed}',
+                r'{corrected_output_folder_simplified}', '1', workers=None, write_cache=True, incremental=True)
 
 print("Batch processing completed successfully.")
 """
@@ -359,6 +343,18 @@ def select_processed_file():
         return None
 
 
+def parse_calibrations(a_text, b_text):
+    """
+    (A, B) water content calibrations from the A and B fields. Several calibrations are entered as comma
+    separated lists of the same length; an empty field uses the default calibration.
+    """
+    a_values = [float(value) for value in a_text.split(',')] if a_text.strip() else [DEFAULT_CALIBRATION[0]]
+    b_values = [float(value) for value in b_text.split(',')] if b_text.strip() else [DEFAULT_CALIBRATION[1]]
+    if len(a_values) != len(b_values):
+        raise ValueError(f"{len(a_values)} A values but {len(b_values)} B values")
+    return list(zip(a_values, b_values))
+
+
 def start_inversion_with_parameters(ui):
     """
     Capture inversion parameters from the UI and initiate inversion processing.
@@ -376,8 +372,8 @@ def start_inversion_with_parameters(ui):
         dphi = float(ui.dPhiLineEdit.text()) if ui.dPhiLineEdit.text() else 2
         robust_data = ui.checkBox.isChecked()
 
-        A = float(ui.ALineEdit.text()) if ui.ALineEdit.text() else 246.47
-        B = float(ui.BLineEdit.text()) if ui.BLineEdit.text() else -0.627
+        calibrations = parse_calibrations(ui.ALineEdit.text(), ui.BLineEdit.text())
+        A, B = calibrations[0]
 
         compute_water_content = ui.computeWaterContentCheckBox.isChecked()
 
@@ -395,15 +391,30 @@ def start_inversion_with_parameters(ui):
     processed_file_path = select_processed_file()
 
     if processed_file_path:
-        # Run inversion and display output
-        output_image_path, ert_plot_filename = startInversion(
-            [start_x, start_z],
-            [end_x, end_z],
-            quality,
-            area,
-            inversion_params,
-            processed_file_path
-        )
+        # A model inverted before from the same survey and settings is reused, so trying other water
+        # content calibrations does not run the inversion again
+        model_cache_key = model_key(processed_file_path, start=[start_x, start_z], end=[end_x, end_z],
+                                    quality=quality, area=area, **inversion_params)
+        # The figures of the cached model are restored too, the files of the survey may be from other settings
+        figures = dict(zip(("figure", "ert_plot"), figure_paths(processed_file_path)))
+        cached_model = load_model(model_cache_key, figures) if compute_water_content else None
+        if cached_model is not None:
+            print(f"Reusing the inversion model of {processed_file_path} from the cache")
+            output_image_path, ert_plot_filename = figures["figure"], figures["ert_plot"]
+            inversion_result = {"model": cached_model}
+        else:
+            # Run inversion and display output, keeping the model for the water content computation
+            inversion_result = invert_survey(
+                [start_x, start_z],
+                [end_x, end_z],
+                quality,
+                area,
+                inversion_params,
+                processed_file_path
+            )
+            output_image_path, ert_plot_filename = inversion_result["figure"], inversion_result["ert_plot"]
+            save_model(model_cache_key, inversion_result["model"],
+                       {"figure": output_image_path, "ert_plot": ert_plot_filename})
 
         if output_image_path and os.path.exists(output_image_path):
             output_image_folder = os.path.dirname(output_image_path)
@@ -430,7 +441,9 @@ def start_inversion_with_parameters(ui):
                     dphi,
                     A,
                     B,
-                    processed_file_path
+                    processed_file_path,
+                    inversion_result=inversion_result,
+                    calibrations=calibrations
                 )
 
                 # Display Water Content Image
@@ -1,10 +1,12 @@
 import os
 
+import numpy as np
 import pytest
 from unittest.mock import patch, call
 from PyQt5.QtWidgets import QApplication, QMainWindow
 
 import ui_logic
+from lib import petrophysics
 from UI import Ui_MainWindow
 from ui_logic import setup_ui_logic, start_data_processing, reset_all_fields, open_file_browser
 
@@ -43,9 +45,7 @@ def test_start_data_processing_without_files(ui):
          patch('ui_logic.global_selected_temperature_file', None), \
          patch('builtins.print') as mock_print, \
          patch('PyQt5.QtWidgets.QFileDialog.getExistingDirectory', return_value='') as mock_dialog, \
-         patch('data_processor.convert_tx0_to_txt') as mock_convert, \
-         patch('data_processor.filter_temperature_data_by_date') as mock_filter, \
-         patch('data_processor.calibrate_resistivity') as mock_calibrate:
+         patch('data_processor.process_surveys') as mock_process:
         start_data_processing(ui)
 
         expected_calls = [
@@ -61,13 +61,9 @@ def test_start_data_processing_with_files(ui):
     with patch('ui_logic.global_tx0_input_folder', "dummy_folder_path"), \
          patch('ui_logic.global_selected_temperature_file', "dummy_temp_file.txt"), \
          patch('PyQt5.QtWidgets.QFileDialog.getExistingDirectory', return_value="output_dir"), \
-         patch('ui_logic.convert_tx0_to_txt') as mock_convert, \
-         patch('ui_logic.filter_temperature_data_by_date') as mock_filter, \
-         patch('ui_logic.calibrate_resistivity') as mock_calibrate:
+         patch('ui_logic.process_surveys') as mock_process:
         start_data_processing(ui)
-        mock_convert.assert_called_once()
-        mock_filter.assert_called_once()
-        mock_calibrate.assert_called_once()
+        mock_process.assert_called_once()
 
 
 def test_reset_all_fields(ui):
@@ -111,6 +107,42 @@ def test_exit_application(app, ui):
         mock_quit.assert_called_once()
 
 
+def test_parse_calibrations():
+    assert ui_logic.parse_calibrations("", "") == [(246.47, -0.627)]
+    assert ui_logic.parse_calibrations("246.47, 300", "-0.627,-0.7") == [(246.47, -0.627), (300.0, -0.7)]
+    with pytest.raises(ValueError):
+        ui_logic.parse_calibrations("246.47, 300", "-0.627")
+
+
+def test_cached_model_restores_its_own_figures(ui, tmp_path, monkeypatch):
+    monkeypatch.setattr(petrophysics, "CACHE_DIR", str(tmp_path / "models"))
+    survey = tmp_path / "survey.txt"
+    survey.write_text("processed survey\n")
+    figures = (str(tmp_path / "inversion_result_survey.png"), str(tmp_path / "ert_plot_survey.png"))
+
+    def invert(start, end, quality, area, inversion_params, file_path):
+        for figure in figures:
+            with open(figure, 'w') as f:
+                f.write(f"lambda={inversion_params['lambda']:g}")
+        return {"figure": figures[0], "ert_plot": figures[1], "model": [inversion_params["lambda"]]}
+
+    ui.computeWaterContentCheckBox.setChecked(True)
+    with patch.object(ui_logic, 'select_processed_file', return_value=str(survey)), \
+            patch.object(ui_logic, 'figure_paths', return_value=figures), \
+            patch.object(ui_logic, 'invert_survey', side_effect=invert) as mock_invert, \
+            patch.object(ui_logic, 'water_computing', return_value=None) as mock_water:
+        for lambda_value in ("10", "20", "10"):
+            ui.LambdaLineEdit.setText(lambda_value)
+            ui_logic.start_inversion_with_parameters(ui)
+
+        # The third run reuses the lambda=10 model and shows its figures, not those of lambda=20
+        assert mock_invert.call_count == 2
+        np.testing.assert_array_equal(mock_water.call_args.kwargs["inversion_result"]["model"], [10.0])
+        for figure in figures:
+            with open(figure) as f:
+                assert f.read() == "lambda=10"
+
+
 # main function
 if __name__ == '__main__':
     pytest.main()